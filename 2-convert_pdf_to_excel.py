@@ -1,31 +1,82 @@
-import convertapi
+import io
 import os
+import sys
+import pandas as pd
 
 UPLOAD_FOLDER = "uploads/"
 OUTPUT_FOLDER = "processed_files/"
 
-# Get the uploaded file (automatically fetch the first PDF)
-pdf_files = [f for f in os.listdir(UPLOAD_FOLDER) if f.endswith(".pdf")]
-if not pdf_files:
-    print("No PDF found in uploads folder!")
-    exit()
-
-# Set the path to the first PDF found in the upload folder
-pdf_path = os.path.join(UPLOAD_FOLDER, pdf_files[0])
-
-# You can set the password manually or prompt the user for it
-password = "your_pdf_password"  # Replace this with the actual password or prompt the user
-
-# Ensure API Key
-convertapi.api_credentials = "secret_viSj4JkvafyxlawY"
-
-# Convert PDF to Excel
-print(f"Processing PDF: {pdf_path}")
-try:
-    convertapi.convert('xlsx', {
-        'File': pdf_path,
-        'OcrLanguage': 'en',
-    }, from_format='pdf').save_files(OUTPUT_FOLDER)
-    print("PDF conversion complete!")
-except Exception as e:
-    print(f"Error during conversion: {e}")
\ No newline at end of file
+# "convertapi" uploads the PDF for conversion; "local" parses it in-process
+PDF_ENGINE = os.getenv("PDF_ENGINE", "convertapi")
+
+# Bump when the sheets this stage produces change, so memoized outputs are rebuilt
+STAGE_VERSION = "1"
+
+# Required by the convertapi engine; never committed
+CONVERTAPI_SECRET = os.getenv("CONVERTAPI_SECRET")
+
+def convert_pdf(pdf_path, password="", output_folder=None, engine=None):
+    """Converts a PDF statement to Excel and returns every sheet as a DataFrame.
+
+    pdf_path may also be the PDF's bytes, e.g. straight from a download.
+    The XLSX is only written to disk when an output folder is given. With
+    the local engine the table is read straight from the PDF (one "sheet"
+    per page) and no Excel file is involved.
+    """
+    engine = engine or PDF_ENGINE
+    in_memory = isinstance(pdf_path, (bytes, bytearray))
+    if engine == "local":
+        from pdf_extract import extract_sheets
+        sheets = extract_sheets(pdf_path, password)
+        if output_folder:
+            # Only for debugging and the stage-by-stage CLI
+            name = "statement" if in_memory else os.path.splitext(os.path.basename(pdf_path))[0]
+            excel_path = os.path.join(output_folder, name + ".xlsx")
+            with pd.ExcelWriter(excel_path, engine="openpyxl") as writer:
+                for sheet_name, df in sheets.items():
+                    df.to_excel(writer, sheet_name=sheet_name, header=False, index=False)
+        return sheets
+    if engine != "convertapi":
+        raise ValueError(f"Unknown PDF engine: {engine}")
+    if not CONVERTAPI_SECRET:
+        raise ValueError("PDF_ENGINE=convertapi needs CONVERTAPI_SECRET; set it or use PDF_ENGINE=local")
+
+    # Only the ConvertAPI engine needs the client library
+    import convertapi
+
+    convertapi.api_credentials = CONVERTAPI_SECRET
+    source = convertapi.UploadIO(io.BytesIO(pdf_path), "statement.pdf") if in_memory else pdf_path
+    params = {'File': source, 'OcrLanguage': 'en'}
+    if password:
+        params['Password'] = password
+
+    result = convertapi.convert('xlsx', params, from_format='pdf')
+    if output_folder:
+        result.save_files(output_folder)
+
+    return pd.read_excel(result.file.io, sheet_name=None, engine="openpyxl", header=None)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        pdf_path = sys.argv[1]
+    else:
+        # Get the uploaded file (automatically fetch the first PDF)
+        pdf_files = [f for f in os.listdir(UPLOAD_FOLDER) if f.endswith(".pdf")]
+        if not pdf_files:
+            print("No PDF found in uploads folder!")
+            exit()
+
+        # Set the path to the first PDF found in the upload folder
+        pdf_path = os.path.join(UPLOAD_FOLDER, pdf_files[0])
+
+    # The password and a job's output folder can be passed as extra arguments
+    password = sys.argv[2] if len(sys.argv) > 2 else ""
+    output_folder = sys.argv[3] if len(sys.argv) > 3 else OUTPUT_FOLDER
+
+    # Convert PDF to Excel
+    print(f"Processing PDF: {pdf_path}")
+    try:
+        convert_pdf(pdf_path, password, output_folder=output_folder)
+        print("PDF conversion complete!")
+    except Exception as e:
+        print(f"Error during conversion: {e}")
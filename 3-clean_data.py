@@ -1,96 +1,258 @@
+import csv
+import heapq
+import itertools
+import numpy as np
 import pandas as pd
 import os
+import sys
+import tempfile
+from statement_store import typed_statement, write_statement, export_csv, csv_to_parquet
 
 OUTPUT_FOLDER = "processed_files/"
-excel_files = [f for f in os.listdir(OUTPUT_FOLDER) if f.endswith(".xlsx")]
+OUTPUT_FILENAME = "cleaned_bank_statement.parquet"
+CSV_FILENAME = "cleaned_bank_statement.csv"
 
-if not excel_files:
-    print("No Excel file found in processed folder!")
-    exit()
+# Rows per chunk when streaming a workbook
+CHUNK_ROWS = int(os.getenv("CLEAN_CHUNK_ROWS", "5000"))
 
-excel_file = os.path.join(OUTPUT_FOLDER, excel_files[0])
-
-# Read all sheets first
-all_sheets = pd.read_excel(excel_file, sheet_name=None, engine="openpyxl", header=None)
-
-# Get the first sheet to extract headers
-first_sheet_name = list(all_sheets.keys())[0]
-first_sheet = all_sheets[first_sheet_name]
-
-column_names = first_sheet.columns.tolist()
-
-# Find the header row in the first sheet
-# header_row_idx = None
-# for idx, row in first_sheet.iterrows():
-#     if row.notna().sum() >= 3:  # At least 3 non-null values to be considered a header
-#         header_row_idx = idx
-#         column_names = row.tolist()
-#         break
-
-if column_names is None:
-    print("Could not find valid headers in the first sheet!")
-    exit()
+# Bump when the cleaned output changes, so memoized outputs are rebuilt
+STAGE_VERSION = "2"
 
 def clean_table(df, column_names):
+    """Merges continuation lines into the dated transaction above them.
+
+    A row with a Date starts a transaction; the Narration of undated rows
+    below it is appended, space-separated. Rows before the first dated row
+    are dropped.
+    """
     # Drop completely empty rows
     df = df.dropna(how='all')
-    
+
     # Assign column names
-    # if len(df.columns) != len(column_names):
-    #     # Pad or truncate columns to match the expected number
-    #     if len(df.columns) < len(column_names):
-    #         for i in range(len(df.columns), len(column_names)):
-    #             df[i] = None
-    #     df = df.iloc[:, :len(column_names)]
-    
     df.columns = column_names
-    
-    cleaned_rows = []
-    current_row = None
-    
-    for _, row in df.iterrows():
-        # Check if this is a new transaction (has a date)
-        if pd.notna(row['Date']):
-            if current_row is not None:
-                cleaned_rows.append(current_row)
-            current_row = row.copy()
-        else:
-            # This is a continuation of the narration
-            if current_row is not None and pd.notna(row['Narration']):
-                current_narration = str(current_row['Narration']).strip()
-                additional_narration = str(row['Narration']).strip()
-                if additional_narration:  # Only append if there's actual content
-                    current_row['Narration'] = f"{current_narration} {additional_narration}"
-    
-    # Don't forget to append the last row
-    if current_row is not None:
-        cleaned_rows.append(current_row)
-    
-    return pd.DataFrame(cleaned_rows)
-
-# Process all sheets
-cleaned_tables = []
-for sheet_name, df in all_sheets.items():
-    if sheet_name == first_sheet_name:
-        # For first sheet, skip the header row
-        df = df.iloc[1:]
-    
-    cleaned_df = clean_table(df, column_names)
-    if not cleaned_df.empty:
-        cleaned_tables.append(cleaned_df)
-
-# Combine all cleaned tables
-if cleaned_tables:
+
+    # Group key: every dated row starts a new group, 0 means "before the first transaction"
+    dated = df['Date'].notna().to_numpy()
+    group = dated.cumsum()
+
+    transactions = df[dated].copy()
+
+    # Continuation narrations with actual content
+    continuation = ~dated & (group > 0) & df['Narration'].notna().to_numpy()
+    additional = df['Narration'][continuation].map(str).str.strip()
+    has_content = (additional != '').to_numpy()
+    additional = additional.to_numpy()[has_content].tolist()
+    additional_group = group[continuation][has_content]
+
+    if additional:
+        # Group keys are already sorted, so each group is a contiguous run to join
+        starts = np.flatnonzero(np.r_[True, additional_group[1:] != additional_group[:-1]])
+        ends = np.r_[starts[1:], len(additional)]
+        group_ids = additional_group[starts]
+        joined = pd.Series([' '.join(additional[s:e]) for s, e in zip(starts, ends)], index=group_ids)
+        counts = pd.Series(ends - starts, index=group_ids)
+
+        # Group k belongs to the k-th dated row
+        positions = group_ids - 1
+        head = pd.Series(transactions['Narration'].iloc[positions].map(str).str.strip().to_numpy(), index=joined.index)
+
+        # Matches appending one line at a time, which re-strips the growing narration
+        merged = (head + ' ' + joined).where((head != '') | (counts < 2), joined)
+        transactions.iloc[positions, transactions.columns.get_loc('Narration')] = merged.to_numpy()
+
+    return transactions
+
+def clean_chunks(raw_chunks, column_names):
+    """Yields cleaned transactions from a sequence of raw row chunks, in order.
+
+    The last transaction of each chunk is held back until the next chunk
+    arrives, so narrations continuing across a sheet or chunk boundary are
+    merged into it.
+    """
+    date_position = column_names.index('Date')
+    carry = None
+
+    for raw in raw_chunks:
+        raw = raw.dropna(how='all')
+        if carry is not None:
+            raw = pd.concat([carry, raw], ignore_index=True)
+
+        dated = np.flatnonzero(raw.iloc[:, date_position].notna().to_numpy())
+        if len(dated) == 0:
+            carry = raw
+            continue
+
+        last = dated[-1]
+        if last > 0:
+            cleaned_df = clean_table(raw.iloc[:last], column_names)
+            if not cleaned_df.empty:
+                yield cleaned_df
+        carry = raw.iloc[last:]
+
+    if carry is not None:
+        cleaned_df = clean_table(carry, column_names)
+        if not cleaned_df.empty:
+            yield cleaned_df
+
+def clean_sheets(all_sheets):
+    """Cleans every sheet of a converted statement and combines them into one table."""
+    # Get the first sheet to extract headers
+    first_sheet_name = list(all_sheets.keys())[0]
+    first_sheet = all_sheets[first_sheet_name]
+
+    # The header is the first row of the first sheet
+    column_names = first_sheet.iloc[0].tolist()
+
+    # For first sheet, skip the header row
+    sheets = [df.iloc[1:] if sheet_name == first_sheet_name else df for sheet_name, df in all_sheets.items()]
+
+    # Process all sheets
+    cleaned_tables = list(clean_chunks(sheets, column_names))
+
+    if not cleaned_tables:
+        return pd.DataFrame(columns=column_names)
+
+    # Combine all cleaned tables
     combined_df = pd.concat(cleaned_tables, ignore_index=True)
-    
+
+    # Numeric amounts and datetime dates, so later stages never re-parse text
+    combined_df = typed_statement(combined_df)
+
     # Sort by date if date column exists
     if 'Date' in combined_df.columns:
-        combined_df['Date'] = pd.to_datetime(combined_df['Date'], errors='coerce')
         combined_df = combined_df.sort_values('Date')
 
-    # Save to CSV
-    csv_output = os.path.join(OUTPUT_FOLDER, "cleaned_bank_statement.csv")
-    combined_df.to_csv(csv_output, index=False)
-    print(f"Cleaned data saved to: {csv_output}")
-else:
-    print("No valid data found in any sheet!")
\ No newline at end of file
+    return combined_df
+
+def read_sheet_chunks(excel_file, chunk_rows=CHUNK_ROWS):
+    """Yields (column_names, chunk) pairs, reading one sheet at a time in read-only mode."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        column_names = None
+        for worksheet in workbook.worksheets:
+            rows = worksheet.iter_rows(values_only=True)
+            if column_names is None:
+                # The header is the first row of the first sheet
+                column_names = list(next(rows, ()))
+
+            chunk = []
+            for row in rows:
+                chunk.append(row[:len(column_names)])
+                if len(chunk) >= chunk_rows:
+                    yield column_names, pd.DataFrame(chunk, columns=range(len(column_names)))
+                    chunk = []
+            if chunk:
+                yield column_names, pd.DataFrame(chunk, columns=range(len(column_names)))
+    finally:
+        workbook.close()
+
+def sorted_runs(chunks, run_folder):
+    """Writes date-sorted chunks to CSV run files; chunks that continue in order share a run."""
+    runs = []
+    last_date = None
+    for chunk in chunks:
+        chunk['Date'] = pd.to_datetime(chunk['Date'], errors='coerce')
+        chunk = chunk.sort_values('Date', kind='stable')
+
+        first_date = chunk['Date'].iloc[0]
+        in_order = last_date is not None and pd.notna(first_date) and first_date >= last_date
+        if not in_order:
+            runs.append(os.path.join(run_folder, f"run_{len(runs):05d}.csv"))
+        chunk.to_csv(runs[-1], mode='a', header=not in_order, index=False)
+
+        dates = chunk['Date'].dropna()
+        # A NaT tail sorts last, so the next chunk has to start a new run
+        last_date = dates.iloc[-1] if len(dates) == len(chunk) else None
+    return runs
+
+def merge_runs(runs, output_file):
+    """Merges date-sorted CSV runs into one date-sorted CSV, one row at a time."""
+    files = [open(run, newline='') for run in runs]
+    try:
+        readers = [csv.reader(f) for f in files]
+        header = [next(reader) for reader in readers][0]
+        date_position = header.index('Date')
+
+        # ISO dates sort correctly as text; empty (NaT) dates go last
+        def sort_key(row):
+            return (row[date_position] == '', row[date_position])
+
+        with open(output_file, 'w', newline='') as out:
+            writer = csv.writer(out)
+            writer.writerow(header)
+            writer.writerows(heapq.merge(*readers, key=sort_key))
+    finally:
+        for f in files:
+            f.close()
+
+def clean_workbook_streaming(excel_file, output_file, chunk_rows=CHUNK_ROWS):
+    """Cleans a workbook with bounded memory and writes the date-sorted CSV.
+
+    Returns the number of transactions written.
+    """
+    chunks = read_sheet_chunks(excel_file, chunk_rows)
+    first = next(chunks, None)
+    if first is None:
+        return 0
+    column_names = first[0]
+    raw_chunks = itertools.chain([first[1]], (chunk for _, chunk in chunks))
+
+    rows = 0
+    def counted(cleaned):
+        nonlocal rows
+        for chunk in cleaned:
+            rows += len(chunk)
+            yield chunk
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(output_file) or None) as run_folder:
+        runs = sorted_runs(counted(clean_chunks(raw_chunks, column_names)), run_folder)
+        if runs:
+            merge_runs(runs, output_file)
+    return rows
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a not in ("--stream", "--csv")]
+    stream = "--stream" in sys.argv[1:]
+    # Also export the cleaned statement as CSV
+    export = "--csv" in sys.argv[1:]
+
+    # A job's output folder can be passed as the first argument
+    output_folder = args[0] if args else OUTPUT_FOLDER
+    excel_files = [os.path.join(output_folder, f) for f in os.listdir(output_folder) if f.endswith(".xlsx")]
+
+    if not excel_files:
+        print("No Excel file found in processed folder!")
+        exit()
+
+    # Use the most recently converted statement
+    excel_file = max(excel_files, key=os.path.getmtime)
+    output_file = os.path.join(output_folder, OUTPUT_FILENAME)
+    csv_output = os.path.join(output_folder, CSV_FILENAME)
+
+    if stream:
+        # Read one sheet at a time, for statements too large to hold in memory
+        if clean_workbook_streaming(excel_file, csv_output):
+            csv_to_parquet(csv_output, output_file)
+            print(f"Cleaned data saved to: {output_file}")
+            if export:
+                print(f"CSV export saved to: {csv_output}")
+            else:
+                os.remove(csv_output)
+        else:
+            print("No valid data found in any sheet!")
+        exit()
+
+    # Read all sheets first
+    all_sheets = pd.read_excel(excel_file, sheet_name=None, engine="openpyxl", header=None)
+    combined_df = clean_sheets(all_sheets)
+
+    if not combined_df.empty:
+        write_statement(combined_df, output_file)
+        print(f"Cleaned data saved to: {output_file}")
+        if export:
+            export_csv(combined_df, csv_output)
+            print(f"CSV export saved to: {csv_output}")
+    else:
+        print("No valid data found in any sheet!")
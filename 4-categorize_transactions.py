@@ -1,134 +1,155 @@
 import os
-import re
-import pandas as pd
+import sys
+import threading
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+from merchant_cache import MerchantCache, normalize_merchant
+from narration_parser import parse_narration, parse_narrations
+from llm_batch import cached_categories, classify_uncached
+from merchant_classifier import load_classifier
+from merchant_rules import get_rule_store, current_rules
+from statement_store import parse_amounts, read_statement, write_statement, export_csv
 
 # Load environment variables
 load_dotenv()
 
 # Define directories
 OUTPUT_FOLDER = "processed_files/"
-INPUT_FILE = os.path.join(OUTPUT_FOLDER, "cleaned_bank_statement.csv")
-OUTPUT_FILE = os.path.join(OUTPUT_FOLDER, "categorized_bank_statement.csv")
+INPUT_FILENAME = "cleaned_bank_statement.parquet"
+OUTPUT_FILENAME = "categorized_bank_statement.parquet"
+CSV_FILENAME = "categorized_bank_statement.csv"
+
+# Bump when the categorization code changes; rule edits are tracked by rules_version()
+STAGE_VERSION = "3"
+
+def rules_version():
+    """Short hash of the current merchant rules, so cached results can be invalidated when they change."""
+    return current_rules().version
 
 class UPITransactionCategorizer:
-    def __init__(self):
-        self.company_categories = {
-            "PAYROLL": "INCOME", "SALARY CREDIT": "INCOME", "SAL CREDIT": "INCOME",
-            "HR PAYMENT": "INCOME", "PAY DISBURSEMENT": "INCOME", "WAGES": "INCOME",
-            "BUSINESS INCOME": "INCOME", "FREELANCE PAYMENT": "INCOME", "CLIENT PAYMENT": "INCOME",
-            "INVOICE PAYMENT": "INCOME", "PAYMENT RECEIVED": "INCOME", "REVENUE CREDIT": "INCOME",
-            "INTEREST CREDIT": "INCOME", "BANK INTEREST": "INCOME", "FD INTEREST": "INCOME",
-            "RD INTEREST": "INCOME", "DEPOSIT INTEREST": "INCOME", "SAVINGS ACCOUNT INTEREST": "INCOME",
-            "REFUND": "INCOME", "REVERSAL": "INCOME", "CASHBACK": "INCOME", "MONEYBACK": "INCOME",
-            "DISCOUNT CREDIT": "INCOME", "CHARGEBACK": "INCOME", "REVERSAL CREDIT": "INCOME",
-            "SUBSIDY": "INCOME", "PENSION CREDIT": "INCOME", "SCHOLARSHIP": "INCOME", "GOVERNMENT PAYMENT": "INCOME",
-
-            "PRUDENT": "SAVINGS_INVESTMENTS", "SBI MF": "SAVINGS_INVESTMENTS", "HDFC MF": "SAVINGS_INVESTMENTS",
-            "ICICI PRU MF": "SAVINGS_INVESTMENTS", "AXIS MF": "SAVINGS_INVESTMENTS", "MOTILAL OSWAL MF": "SAVINGS_INVESTMENTS",
-            "UTI MF": "SAVINGS_INVESTMENTS", "NIPPON MF": "SAVINGS_INVESTMENTS", "TATA MF": "SAVINGS_INVESTMENTS",
-            "ZERODHA": "SAVINGS_INVESTMENTS", "UPSTOX": "SAVINGS_INVESTMENTS", "GROWW": "SAVINGS_INVESTMENTS",
-            "5PAISA": "SAVINGS_INVESTMENTS", "ANGEL ONE": "SAVINGS_INVESTMENTS", "ICICI DIRECT": "SAVINGS_INVESTMENTS",
-            "SIP": "SAVINGS_INVESTMENTS", "FD": "SAVINGS_INVESTMENTS", "RD": "SAVINGS_INVESTMENTS",
-            "NATIONAL SAVINGS CERTIFICATE": "SAVINGS_INVESTMENTS", "BOND PURCHASE": "SAVINGS_INVESTMENTS",
-
-            "LOAN EMI": "LIABILITIES", "HDFC EMI": "LIABILITIES", "ICICI EMI": "LIABILITIES", "SBI EMI": "LIABILITIES",
-            "BAJAJ FIN EMI": "LIABILITIES", "CREDIT CARD PAYMENT": "LIABILITIES", "HDFC CREDIT CARD": "LIABILITIES",
-            "ICICI CC PAYMENT": "LIABILITIES", "AXIS CC BILL": "LIABILITIES", "HDFC LOAN": "LIABILITIES",
-            "ICICI LOAN": "LIABILITIES", "KOTAK LOAN": "LIABILITIES", "AXIS LOAN": "LIABILITIES", "INDUSIND LOAN": "LIABILITIES",
-            "ZESTMONEY": "LIABILITIES", "SIMPL PAY": "LIABILITIES", "LAZYPAY": "LIABILITIES", "POSTPE": "LIABILITIES",
-            "AMAZON PAY LATER": "LIABILITIES", "EMI": "LIABILITIES",
-
-            "HUNGERBOX":"DISCRETIONARY_EXPENSES", "HUBBLE":"DISCRETIONARY_EXPENSES","AMAZON": "DISCRETIONARY_EXPENSES", "FLIPKART": "DISCRETIONARY_EXPENSES", "AJIO": "DISCRETIONARY_EXPENSES",
-            "TATA CLIQ": "DISCRETIONARY_EXPENSES", "NYKAA": "DISCRETIONARY_EXPENSES", "NETFLIX": "DISCRETIONARY_EXPENSES",
-            "PRIME VIDEO": "DISCRETIONARY_EXPENSES", "SPOTIFY": "DISCRETIONARY_EXPENSES", "HOTSTAR": "DISCRETIONARY_EXPENSES",
-            "APPLE MUSIC": "DISCRETIONARY_EXPENSES", "SWIGGY": "DISCRETIONARY_EXPENSES", "ZOMATO": "DISCRETIONARY_EXPENSES",
-            "DOMINOS": "DISCRETIONARY_EXPENSES", "MCDONALDS": "DISCRETIONARY_EXPENSES", "BARISTA": "DISCRETIONARY_EXPENSES",
-            "STARBUCKS": "DISCRETIONARY_EXPENSES", "MAKEMYTRIP": "DISCRETIONARY_EXPENSES", "YATRA": "DISCRETIONARY_EXPENSES",
-            "GOIBIBO": "DISCRETIONARY_EXPENSES", "UBER": "DISCRETIONARY_EXPENSES", "OLA": "DISCRETIONARY_EXPENSES",
-            "AIRBNB": "DISCRETIONARY_EXPENSES", "APPLE STORE": "DISCRETIONARY_EXPENSES", "ROLEX": "DISCRETIONARY_EXPENSES",
-            "OMEGA": "DISCRETIONARY_EXPENSES", "LV": "DISCRETIONARY_EXPENSES",
-
-            "HPCL": "TRANSPORT_FUEL", "BPCL": "TRANSPORT_FUEL", "IOCL": "TRANSPORT_FUEL", "PETROL PUMP": "TRANSPORT_FUEL",
-            "METRO CARD": "TRANSPORT_FUEL", "IRCTC": "TRANSPORT_FUEL", "RAILWAY TICKET": "TRANSPORT_FUEL",
-            "BLABLA CAR": "TRANSPORT_FUEL", "VEHICLE LOAN": "TRANSPORT_FUEL",
-
-            "DREAM11": "RED_FLAGS", "RUMMYCIRCLE": "RED_FLAGS", "BET365": "RED_FLAGS", "PARIMATCH": "RED_FLAGS",
-            "CASHE": "RED_FLAGS", "MONEYVIEW": "RED_FLAGS", "KREDITBEE": "RED_FLAGS", "NAVI LOAN": "RED_FLAGS",
-            "CRYPTO EXCHANGE": "RED_FLAGS", "FOREX TRADING": "RED_FLAGS", "RIPPLE": "RED_FLAGS", "WAZIRX": "RED_FLAGS",
-            "COINBASE": "RED_FLAGS", "COINDCX": "RED_FLAGS", "ZEBPAY": "RED_FLAGS",
-
-            "APOLLO": "HEALTHCARE_INSURANCE", "FORTIS": "HEALTHCARE_INSURANCE", "MAX HEALTHCARE": "HEALTHCARE_INSURANCE",
-            "MEDANTA": "HEALTHCARE_INSURANCE", "LIC PREMIUM": "HEALTHCARE_INSURANCE", "TATA AIG": "HEALTHCARE_INSURANCE",
-            "ICICI LOMBARD": "HEALTHCARE_INSURANCE", "HDFC ERGO": "HEALTHCARE_INSURANCE", "PHARMACY": "HEALTHCARE_INSURANCE",
-            "1MG": "HEALTHCARE_INSURANCE", "MEDPLUS": "HEALTHCARE_INSURANCE",
-
-            "INCOME TAX": "GOVERNMENT_TAX_PAYMENTS", "GST PAYMENT": "GOVERNMENT_TAX_PAYMENTS", "TDS": "GOVERNMENT_TAX_PAYMENTS",
-            "NPS": "GOVERNMENT_TAX_PAYMENTS", "EPF": "GOVERNMENT_TAX_PAYMENTS", "PPF": "GOVERNMENT_TAX_PAYMENTS",
-            "FASTAG RECHARGE": "GOVERNMENT_TAX_PAYMENTS", "TRAFFIC CHALLAN": "GOVERNMENT_TAX_PAYMENTS",
-            "MUNICIPAL TAX": "GOVERNMENT_TAX_PAYMENTS"
-        }
-
-
-        # Load LLM for categorization fallback
-        self.llm = ChatGroq(
-            temperature=0.3,
-            model_name="llama-3.3-70b-specdec",
-            groq_api_key=os.getenv("GROK_API_KEY")
-        )
+    """Rules, then cached LLM answers, the offline classifier and the LLM; safe to share between threads."""
+
+    def __init__(self, cache=None, classifier=None, llm=None, rules=None):
+        # Merchant and keyword rules from merchant_rules.json, reloaded when the file changes
+        self.rules = rules if rules is not None else get_rule_store()
+
+        # Offline model for unknown merchants, used before the LLM when it is confident
+        self.classifier = classifier if classifier is not None else load_classifier()
+
+        # LLM for the categorization fallback, created on first use
+        self._llm = llm
+        self._llm_lock = threading.Lock()
+
+        # LLM answers are remembered across runs, keyed by normalized merchant name
+        self.cache = cache if cache is not None else MerchantCache()
+
+    @property
+    def classifier_version(self):
+        """The offline model in use ("none" without one), so caches can tell its predictions apart."""
+        return self.classifier.version if self.classifier is not None else "none"
+
+    @property
+    def llm(self):
+        """The ChatGroq client; langchain is only imported when an unknown merchant needs it."""
+        with self._llm_lock:
+            if self._llm is None:
+                from langchain_groq import ChatGroq
+
+                self._llm = ChatGroq(
+                    temperature=0.3,
+                    model_name="llama-3.3-70b-specdec",
+                    groq_api_key=os.getenv("GROK_API_KEY")
+                )
+            return self._llm
+
+    @llm.setter
+    def llm(self, llm):
+        with self._llm_lock:
+            self._llm = llm
 
     def extract_upi_company(self, narration):
         """Extracts UPI merchant name from narration."""
-        match = re.search(r'UPI-([\w\s&]+?)-', narration, re.IGNORECASE)
-        return match.group(1).strip() if match else None
-
-    def categorize_transaction(self, narration):
+        details = parse_narration(narration)
+        return details["counterparty"] if details and details["transaction_type"] == "UPI" else None
+
+    def classify_unknown(self, company_names):
+        """Categorizes merchants the rules don't know: cached LLM answers, then the local model, then the LLM."""
+        results, pending = cached_categories(company_names, self.cache)
+        if pending and self.classifier is not None:
+            results.update(self.classifier.classify(pending))
+            pending = [c for c in pending if c not in results]
+        if pending:
+            results.update(classify_uncached(pending, self.llm, self.cache))
+
+        # Duplicates and merchants nobody could answer for
+        by_key = {normalize_merchant(c): category for c, category in results.items()}
+        return {c: by_key.get(normalize_merchant(c), "OTHERS") for c in company_names}
+
+    def categorize_transaction(self, narration, rules=None):
         """Categorizes a transaction based on predefined categories or uses LLM if unknown."""
+        rules = rules if rules is not None else self.rules.current()
         narration_upper = narration.upper()
         company_name = self.extract_upi_company(narration_upper)
 
-        if company_name and company_name in self.company_categories:
-            return self.company_categories[company_name]
+        if company_name and company_name in rules.categories:
+            return rules.categories[company_name]
 
-        for keyword, category in self.company_categories.items():
-            if keyword in narration_upper:
-                return category
+        # The longest matching keyword wins, e.g. "HDFC EMI" over "EMI"
+        category = rules.matcher.category(narration_upper)
+        if category:
+            return category
 
-        # Fallback: Use LLM for unknown businesses
+        # Fallback: local model, then LLM for unknown businesses
         if company_name:
-            try:
-                response = self.llm.invoke(f"Is '{company_name}' a business/company name or a person's name? "
-                                           "If its a person's name return OTHERS. "
-                                           "If it's clearly a business, return the category from: SAVINGS_INVESTMENTS, "
-                                           "LIABILITIES, DISCRETIONARY_EXPENSES, TRANSPORT_FUEL, RED_FLAGS, HEALTHCARE_INSURANCE, "
-                                           "GOVERNMENT_TAX_PAYMENTS. "
-                                           "If unclear, return 'OTHERS'. Return only the category name.")
-                return response.content.strip().upper()
-            except Exception as e:
-                print(f"LLM Error for {company_name}: {e}")
-                return "OTHERS"
+            return self.classify_unknown([company_name])[company_name]
 
         return "OTHERS"
 
-# Main execution block
-if __name__ == "__main__":
-    if not os.path.exists(INPUT_FILE):
-        print("Error: Cleaned bank statement file not found!")
-        exit()
-
-    categorizer = UPITransactionCategorizer()
-    df = pd.read_csv(INPUT_FILE)
-
-    # Convert amount columns to numeric type
-    def convert_amount(col):
-        return pd.to_numeric(col.astype(str).str.replace(',', ''), errors='coerce')
-
+    def categorize_frame(self, df, rules=None):
+        """Categorizes every row of df['Narration'] and returns the categories as a Series.
+
+        Gives the same result as categorize_transaction per row, but each
+        distinct narration is keyword-matched once and the distinct unknown
+        merchants are classified together, by the local model where it is
+        confident and otherwise in batched, concurrent LLM prompts. The
+        whole frame uses one MerchantRules snapshot: rules, or the current one.
+        """
+        rules = rules if rules is not None else self.rules.current()
+        narrations = df['Narration'].fillna('').astype(str).str.upper()
+        parsed = parse_narrations(narrations)
+        companies = parsed['counterparty'].where(parsed['transaction_type'] == 'UPI')
+
+        # Exact merchant matches
+        categories = companies.map(rules.categories).astype(object)
+
+        # Keyword matches, once per distinct narration
+        pending = categories.isna()
+        unique_narrations = narrations[pending].unique()
+        keyword_categories = {n: rules.matcher.category(n) for n in unique_narrations}
+        categories.loc[pending] = narrations[pending].map(keyword_categories)
+
+        # Model / LLM fallback, once per distinct unknown merchant
+        pending = categories.isna() & companies.notna() & (companies != '')
+        unique_companies = companies[pending].unique()
+        unknown_categories = self.classify_unknown(list(unique_companies))
+        categories.loc[pending] = companies[pending].map(unknown_categories)
+
+        return categories.fillna("OTHERS")
+
+# Convert amount columns to numeric type
+def convert_amount(col):
+    return parse_amounts(col)
+
+def categorize_transactions(df, categorizer=None, rules=None):
+    """Adds a Category column to a cleaned statement and returns it, using the given rules snapshot if any."""
+    if categorizer is None:
+        categorizer = UPITransactionCategorizer()
+
+    df = df.copy()
     df['Withdrawal Amt.'] = convert_amount(df['Withdrawal Amt.'])
     df['Deposit Amt.'] = convert_amount(df['Deposit Amt.'])
 
     # Categorize transactions
-    df['Category'] = df['Narration'].apply(categorizer.categorize_transaction)
+    df['Category'] = categorizer.categorize_frame(df, rules)
 
     # Handle OTHERS category based on transaction amounts
     others_mask = df['Category'] == 'OTHERS'
@@ -138,5 +159,32 @@ if __name__ == "__main__":
     df.loc[withdrawal_mask, 'Category'] = 'Other Expenses'
     df.loc[deposit_mask, 'Category'] = 'Other Income'
 
-    df.to_csv(OUTPUT_FILE, index=False)
-    print(f"Categorized transactions saved to: {OUTPUT_FILE}")
\ No newline at end of file
+    # A handful of distinct labels, so store them as a categorical
+    df['Category'] = df['Category'].astype('category')
+    return df
+
+# Main execution block
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "--csv"]
+    # Also export the categorized statement as CSV
+    export = "--csv" in sys.argv[1:]
+
+    # A job's output folder can be passed as the first argument
+    output_folder = args[0] if args else OUTPUT_FOLDER
+    INPUT_FILE = os.path.join(output_folder, INPUT_FILENAME)
+    OUTPUT_FILE = os.path.join(output_folder, OUTPUT_FILENAME)
+
+    if not os.path.exists(INPUT_FILE):
+        print("Error: Cleaned bank statement file not found!")
+        exit()
+
+    categorizer = UPITransactionCategorizer()
+    df = categorize_transactions(read_statement(INPUT_FILE), categorizer)
+
+    write_statement(df, OUTPUT_FILE)
+    print(f"Categorized transactions saved to: {OUTPUT_FILE}")
+    if export:
+        csv_file = os.path.join(output_folder, CSV_FILENAME)
+        export_csv(df, csv_file)
+        print(f"CSV export saved to: {csv_file}")
+    print(f"Merchant cache: {categorizer.cache.stats()}")
@@ -1,64 +1,62 @@
 import os
-import pandas as pd
+import sys
+from statement_store import read_statement
+from aggregates import aggregate_statement
 
 # Define directories
 OUTPUT_FOLDER = "processed_files/"
-INPUT_FILE = os.path.join(OUTPUT_FOLDER, "categorized_bank_statement.csv")
-OUTPUT_FILE = os.path.join(OUTPUT_FOLDER, "financial_summary.txt")
-
-# Ensure the categorized bank statement exists
-if not os.path.exists(INPUT_FILE):
-    print("Error: Categorized bank statement file not found!")
-    exit()
-
-# Load the CSV
-df = pd.read_csv(INPUT_FILE)
-
-# Ensure required columns exist
-required_columns = {'Date', 'Deposit Amt.', 'Withdrawal Amt.', 'Closing Balance'}
-if not required_columns.issubset(df.columns):
-    print("Error: Missing required columns in the dataset!")
-    exit()
-
-# Convert amount columns to numeric safely
-def convert_amount(col):
-    return pd.to_numeric(col.astype(str).str.replace(',', ''), errors='coerce').fillna(0)
-
-df['Withdrawal Amt.'] = convert_amount(df['Withdrawal Amt.'])
-df['Deposit Amt.'] = convert_amount(df['Deposit Amt.'])
-df['Closing Balance'] = convert_amount(df['Closing Balance'])
-
-# Convert Date column to datetime
-df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-
-# Calculate financial summary
-expenditure = df['Withdrawal Amt.'].sum()
-income = df['Deposit Amt.'].sum()
-savings = income - expenditure
-
-# Extract month-year for grouping
-df['Month'] = df['Date'].dt.to_period('M')
+INPUT_FILENAME = "categorized_bank_statement.parquet"
+OUTPUT_FILENAME = "financial_summary.txt"
+
+# Bump when the summary text changes, so memoized outputs are rebuilt
+STAGE_VERSION = "1"
+
+# The only columns the summary reads
+SUMMARY_COLUMNS = ['Date', 'Deposit Amt.', 'Withdrawal Amt.', 'Closing Balance']
+
+def financial_summary(df, aggregates=None):
+    """Builds the financial summary text for a categorized statement.
+
+    Pass the statement's aggregates when they were already computed for the graphs.
+    """
+    # Ensure required columns exist
+    if not set(SUMMARY_COLUMNS).issubset(df.columns):
+        raise ValueError("Missing required columns in the dataset!")
+
+    if aggregates is None:
+        aggregates = aggregate_statement(df)
+
+    # Format financial summary
+    return f"""
+Income: ₹{aggregates.income:,.2f}\n
+Expenditure: ₹{aggregates.expenditure:,.2f}\n
+Savings: ₹{aggregates.savings:,.2f}\n
+Average Monthly Balance: ₹{aggregates.average_monthly_balance:,.2f}\n
+Savings to Income Ratio: {aggregates.savings_ratio:.2f}%\n
+Average Monthly Expenses: ₹{aggregates.average_monthly_expenses:,.2f}
+"""
 
-# Calculate average monthly balance
-monthly_avg_balance = df.groupby('Month')['Closing Balance'].mean().mean()
+if __name__ == "__main__":
+    # A job's output folder can be passed as the first argument
+    output_folder = sys.argv[1] if len(sys.argv) > 1 else OUTPUT_FOLDER
+    INPUT_FILE = os.path.join(output_folder, INPUT_FILENAME)
+    OUTPUT_FILE = os.path.join(output_folder, OUTPUT_FILENAME)
 
-# Calculate average monthly expenses
-expenditure_avg_balance = df.groupby('Month')['Withdrawal Amt.'].sum().mean()
+    # Ensure the categorized bank statement exists
+    if not os.path.exists(INPUT_FILE):
+        print("Error: Categorized bank statement file not found!")
+        exit()
 
-# Format financial summary
-summary = f"""
-Income: ₹{income:,.2f}\n
-Expenditure: ₹{expenditure:,.2f}\n
-Savings: ₹{savings:,.2f}\n
-Average Monthly Balance: ₹{monthly_avg_balance:,.2f}\n
-Savings to Income Ratio: {((savings / income) * 100) if income != 0 else 0:.2f}%\n
-Average Monthly Expenses: ₹{expenditure_avg_balance:,.2f}
-"""
+    try:
+        summary = financial_summary(read_statement(INPUT_FILE, columns=SUMMARY_COLUMNS))
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit()
 
-# Print and save results
-print(summary)
+    # Print and save results
+    print(summary)
 
-with open(OUTPUT_FILE, "w") as f:
-    f.write(summary)
+    with open(OUTPUT_FILE, "w") as f:
+        f.write(summary)
 
-print(f"Financial summary saved to: {OUTPUT_FILE}")
+    print(f"Financial summary saved to: {OUTPUT_FILE}")
@@ -1,69 +1,55 @@
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
+import sys
+from statement_store import read_statement
+from aggregates import aggregate_statement
+from chart_render import render_charts
 
 # Define directories
 OUTPUT_FOLDER = "processed_files/"
-INPUT_FILE = os.path.join(OUTPUT_FOLDER, "categorized_bank_statement.csv")
-
-# Ensure categorized bank statement exists
-if not os.path.exists(INPUT_FILE):
-    print("Error: Categorized bank statement file not found!")
-    exit()
-
-# Load the categorized bank statement
-df = pd.read_csv(INPUT_FILE)
-
-# Convert 'Date' column to datetime if it exists
-if 'Date' in df.columns:
-    df['Date'] = pd.to_datetime(df['Date'])
-    df['Month'] = df['Date'].dt.to_period('M')  # Extract month-year
-else:
-    print("Error: 'Date' column missing in the dataset!")
-    exit()
-
-# Group by Month for income and expenses
-monthly_summary = df.groupby('Month').agg({
-    'Deposit Amt.': 'sum',
-    'Withdrawal Amt.': 'sum'
-}).reset_index()
-
-# Graph 1: Monthly Income vs Expenses (Line Chart)
-plt.figure(figsize=(10, 6))
-plt.plot(monthly_summary['Month'].astype(str), monthly_summary['Deposit Amt.'], label='Income', marker='o', color='blue')
-plt.plot(monthly_summary['Month'].astype(str), monthly_summary['Withdrawal Amt.'], label='Expenses', marker='o', color='red')
-plt.title('Monthly Income vs Monthly Expenses')
-plt.xlabel('Month')
-plt.ylabel('Amount (₹)')
-plt.legend()
-plt.grid()
-plt.xticks(rotation=45)
-plt.tight_layout()
-graph_path1 = os.path.join(OUTPUT_FOLDER, "monthly_income_vs_expenses.png")
-plt.savefig(graph_path1)
-plt.close()
-
-# Graph 2: Monthly Savings (Bar Chart)
-monthly_summary['Savings'] = monthly_summary['Deposit Amt.'] - monthly_summary['Withdrawal Amt.']
-plt.figure(figsize=(10, 6))
-plt.bar(monthly_summary['Month'].astype(str), monthly_summary['Savings'], color='green')
-plt.title('Monthly Savings')
-plt.xlabel('Month')
-plt.ylabel('Savings (₹)')
-plt.xticks(rotation=45)
-plt.tight_layout()
-graph_path2 = os.path.join(OUTPUT_FOLDER, "monthly_savings.png")
-plt.savefig(graph_path2)
-plt.close()
-
-# Graph 3: Expenses by Category (Pie Chart)
-expense_categories = df[df['Withdrawal Amt.'] > 0].groupby('Category')['Withdrawal Amt.'].sum()
-plt.figure(figsize=(8, 8))
-plt.pie(expense_categories, labels=expense_categories.index, autopct='%1.1f%%', startangle=140)
-plt.title('Expenses by Category')
-plt.tight_layout()
-graph_path3 = os.path.join(OUTPUT_FOLDER, "expenses_by_category.png")
-plt.savefig(graph_path3)
-plt.close()
-
-print(f"Graphs saved successfully:\n{graph_path1}\n{graph_path2}\n{graph_path3}")
+INPUT_FILENAME = "categorized_bank_statement.parquet"
+
+# Bump when the charts change, so memoized outputs are rebuilt
+STAGE_VERSION = "2"
+
+# The only columns the graphs read
+GRAPH_COLUMNS = ['Date', 'Deposit Amt.', 'Withdrawal Amt.', 'Category']
+
+def render_graphs(df, aggregates=None, image_format="png"):
+    """Draws the statement graphs in memory and returns {name: (file name, image bytes)}.
+
+    Pass the statement's aggregates when they were already computed for the summary.
+    """
+    if 'Date' not in df.columns:
+        raise ValueError("'Date' column missing in the dataset!")
+
+    if aggregates is None:
+        aggregates = aggregate_statement(df)
+    return render_charts(aggregates, image_format)
+
+def generate_graphs(df, output_folder, aggregates=None):
+    """Renders the statement graphs into output_folder and returns their paths by name."""
+    graph_paths = {}
+    for name, (filename, image) in render_graphs(df, aggregates).items():
+        graph_paths[name] = os.path.join(output_folder, filename)
+        with open(graph_paths[name], "wb") as f:
+            f.write(image)
+    return graph_paths
+
+if __name__ == "__main__":
+    # A job's output folder can be passed as the first argument
+    output_folder = sys.argv[1] if len(sys.argv) > 1 else OUTPUT_FOLDER
+    INPUT_FILE = os.path.join(output_folder, INPUT_FILENAME)
+
+    # Ensure categorized bank statement exists
+    if not os.path.exists(INPUT_FILE):
+        print("Error: Categorized bank statement file not found!")
+        exit()
+
+    # Load the categorized bank statement
+    try:
+        graph_paths = generate_graphs(read_statement(INPUT_FILE, columns=GRAPH_COLUMNS), output_folder)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit()
+
+    print("Graphs saved successfully:\n" + "\n".join(graph_paths.values()))
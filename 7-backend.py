@@ -1,112 +1,189 @@
 import os
-import requests
-import cloudinary
-import cloudinary.uploader
-import subprocess
-from flask import Flask, request, jsonify
+import time
+from flask import Flask, request, jsonify, send_from_directory
+from pipeline import run_pipeline, rules_version, statement_cache_key, PERSIST_INTERMEDIATES
+from merchant_rules import current_rules
+from result_cache import ResultCache
+from downloader import download_pdf, DownloadError
+from portfolio import PortfolioStore
+from image_storage import upload_images, check_storage, IMAGE_STORAGE, LOCAL_STORAGE_FOLDER
+from workspace import JobWorkspace, JOBS_FOLDER, sweep_stale_workspaces
+from jobs import JobQueue, QueueFullError, QUEUED
+import metrics
+import serving
 
 app = Flask(__name__)
-UPLOAD_FOLDER = "uploads/"
-OUTPUT_FOLDER = "processed_files/"
-PYTHON_CMD = "python3"  # Use "python" if running in Windows
-
-# Ensure required folders exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-
-# ✅ Configure Cloudinary
-cloudinary.config(
-    cloud_name="dzedegcng",  # Replace with your Cloudinary Cloud Name
-    api_key="158983114266962",  # Replace with your Cloudinary API Key
-    api_secret="DK3w8CiFpTfr-T7D5EoA0122s_Q"  # Replace with your Cloudinary API Secret
-)
-
-def upload_to_cloudinary(image_path):
-    """Uploads an image to Cloudinary and returns the URL"""
-    response = cloudinary.uploader.upload(image_path)
-    return response["secure_url"]  # Public URL for the uploaded image
-
-def download_pdf(pdf_url, save_path):
-    """Downloads a PDF from a URL and saves it locally"""
-    try:
-        headers = {"User-Agent": "Mozilla/5.0"}  # Some servers block unknown requests
-        response = requests.get(pdf_url, headers=headers, stream=True)
-
-        if response.status_code != 200:
-            print(f"❌ Failed to download. Status code: {response.status_code}")
-            return False
 
-        # Ensure it's a PDF by checking headers
-        content_type = response.headers.get("Content-Type", "")
-        if "pdf" not in content_type:
-            print(f"⚠️ Warning: Content-Type is {content_type}, not a PDF!")
-        
-        # If the file has no extension, add '.pdf'
-        if not save_path.endswith(".pdf"):
-            save_path += ".pdf"
-
-        with open(save_path, "wb") as pdf_file:
-            for chunk in response.iter_content(chunk_size=8192):
-                pdf_file.write(chunk)
-
-        print(f"✅ PDF downloaded successfully: {save_path}")
-        return True
+# Request latency histograms and the /metrics endpoint
+metrics.instrument(app)
+
+# GET /ready and /healthz; see serving.py for the gunicorn serving mode
+serving.add_readiness(app)
+
+# Fail at startup, not after the first statement has been processed, if graphs can't be stored
+check_storage()
+
+# Every request works in its own jobs/<job_id>/ folder; old ones are swept from time to time
+os.makedirs(JOBS_FOLDER, exist_ok=True)
+sweep_stale_workspaces(JOBS_FOLDER)
+
+# Results of statements we've already processed, keyed by PDF content + password + rules
+result_cache = ResultCache()
+result_cache.invalidate(keep_rules_version=rules_version())
+
+# Customers' monthly rollups across all the statements they have added
+portfolio_store = PortfolioStore()
+
+def process_statement(pdf_url, pdf_password="", job_id=None, timings=False):
+    """Downloads a statement, runs the pipeline and returns the summary & graph URLs.
+
+    With timings, the response also has the seconds spent in each stage.
+    """
+    started = time.perf_counter()
+    with metrics.collect_timings() as breakdown:
+        response = build_statement_response(pdf_url, pdf_password, job_id)
+    if timings:
+        response["timings"] = metrics.rounded({**breakdown, "total": time.perf_counter() - started})
+    return response
+
+def build_statement_response(pdf_url, pdf_password, job_id):
+    """The summary & graph URLs for a statement, from the result cache or the pipeline."""
+    # The workspace is deleted once the result is built
+    with JobWorkspace(job_id=job_id, keep=PERSIST_INTERMEDIATES) as workspace:
+        # Stream the PDF into memory; its hash is computed on the way
+        pdf = download_pdf(pdf_url)
+        if PERSIST_INTERMEDIATES:
+            pdf.save(workspace.pdf_path)
+
+        # Re-uploads of the same statement are answered from the cache; one rules
+        # snapshot serves for both the key and the run, even if the rules reload meanwhile
+        rules = current_rules()
+        cache_key = statement_cache_key(pdf.sha256, pdf_password, rules)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return {"job_id": workspace.job_id, "cached": True, **cached}
+
+        # 🔥 Run every stage in-process, passing the password to the PDF conversion
+        result = run_pipeline(pdf.data, pdf_password, workspace, pdf_digest=pdf.sha256, rules=rules)
+
+        # Upload the graphs from memory, all at once (Cloudinary unless IMAGE_STORAGE says otherwise)
+        graph_urls = upload_images(result["graph_images"])
+
+        response = {"summary_text": result["summary_text"], "graphs": graph_urls}
+        # Failed uploads (null URLs) and merchants the LLM failed on are retried on the next upload
+        if not result["unanswered_merchants"] and None not in graph_urls.values():
+            result_cache.set(cache_key, rules.version, response)
+        return {"job_id": workspace.job_id, "cached": False, **response}
+
+def add_customer_statement(customer_id, account_id, pdf_url, pdf_password=""):
+    """Downloads a statement, runs the pipeline and folds it into the customer's portfolio."""
+    with JobWorkspace(keep=PERSIST_INTERMEDIATES) as workspace:
+        pdf = download_pdf(pdf_url)
+        if PERSIST_INTERMEDIATES:
+            pdf.save(workspace.pdf_path)
+
+        # The same PDF sent twice is recognised before running the pipeline
+        statement_id = pdf.sha256
+        if portfolio_store.has_statement(customer_id, account_id, statement_id):
+            return {"statement_id": statement_id, "already_added": True}
+
+        result = run_pipeline(pdf.data, pdf_password, workspace, pdf_digest=statement_id)
+        return portfolio_store.add_statement(customer_id, account_id, result["transactions"], statement_id)
+
+# Background jobs share one bounded worker pool
+job_queue = JobQueue(
+    lambda job_id, pdf_url, pdf_password, timings: process_statement(pdf_url, pdf_password, job_id, timings)
+)
 
-    except requests.RequestException as e:
-        print(f"Error downloading PDF: {e}")
-        return False
+def read_statement_request():
+    """Returns (pdf_url, password) from the JSON body, or None if pdf_url is missing."""
+    data = request.get_json(silent=True) or {}  # Get JSON data
+    if "pdf_url" not in data:
+        return None
+    return data["pdf_url"], data.get("password", "")  # Get password (default: empty string)
 
+def wants_timings():
+    """True when the client asked for a per-stage timing breakdown (?timings=1 or "timings": true)."""
+    data = request.get_json(silent=True) or {}
+    return request.args.get("timings") in ("1", "true") or data.get("timings") is True
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    data = request.json  # Get JSON data
-    if "pdf_url" not in data:
+    statement = read_statement_request()
+    if statement is None:
         return jsonify({"error": "Missing 'pdf_url' in request"}), 400
 
-    pdf_url = data["pdf_url"]
-    pdf_password = data.get("password", "")  # Get password (default: empty string)
-
-    pdf_filename = pdf_url.split("/")[-1]  # Extract filename from URL
-    temp_pdf_path = os.path.join(UPLOAD_FOLDER, pdf_filename)
+    try:
+        # Return JSON response with financial summary & image URLs
+        return jsonify(process_statement(*statement, timings=wants_timings())), 200
+    except DownloadError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error in pipeline execution: {e}")
+        return jsonify({"error": "Error processing the PDF"}), 500
 
-    # Download the PDF from the URL
-    if not download_pdf(pdf_url, temp_pdf_path):
-        return jsonify({"error": "Failed to download the PDF"}), 400
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queues a statement for processing and returns its job ID immediately."""
+    statement = read_statement_request()
+    if statement is None:
+        return jsonify({"error": "Missing 'pdf_url' in request"}), 400
 
-    # 🔥 Pass the password to convert PDF to Excel script
     try:
-        subprocess.run([PYTHON_CMD, "2-convert_pdf_to_excel.py", temp_pdf_path, pdf_password], check=True)
-        subprocess.run([PYTHON_CMD, "3-clean_data.py"], check=True)
-        subprocess.run([PYTHON_CMD, "4-categorize_transactions.py"], check=True)
-        subprocess.run([PYTHON_CMD, "5-financial_summary.py"], check=True)
-        subprocess.run([PYTHON_CMD, "6-generate_graphs.py"], check=True)
-
-        # Paths to the generated graphs
-        graph_paths = {
-            "income_vs_expenses": os.path.join(OUTPUT_FOLDER, "monthly_income_vs_expenses.png"),
-            "monthly_savings": os.path.join(OUTPUT_FOLDER, "monthly_savings.png"),
-            "expenses_by_category": os.path.join(OUTPUT_FOLDER, "expenses_by_category.png")
-        }
-
-        # Upload graphs to Cloudinary & get URLs
-        graph_urls = {name: upload_to_cloudinary(path) for name, path in graph_paths.items()}
-
-        # Read financial summary from the generated text file
-        summary_file = os.path.join(OUTPUT_FOLDER, "financial_summary.txt")
-        summary_text = "Summary not available"
-        if os.path.exists(summary_file):
-            with open(summary_file, "r") as f:
-                summary_text = f.read()
-
-        # Return JSON response with financial summary & image URLs
-        return jsonify({
-            "summary_text": summary_text,
-            "graphs": graph_urls
-        }), 200
+        job_id = job_queue.submit(*statement, wants_timings())
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+
+    return jsonify({"job_id": job_id, "status": QUEUED}), 202, {"Location": f"/jobs/{job_id}"}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Returns the job's status, plus the summary & graph URLs once it succeeded."""
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job), 200
+
+@app.route('/customers/<customer_id>/statements', methods=['POST'])
+def add_statement(customer_id):
+    """Adds a statement to the customer's portfolio; overlapping transactions are counted once."""
+    statement = read_statement_request()
+    if statement is None:
+        return jsonify({"error": "Missing 'pdf_url' in request"}), 400
+    account_id = (request.get_json(silent=True) or {}).get("account_id", "default")
 
-    except subprocess.CalledProcessError as e:
-        print(f"Error in subprocess execution: {e}")
+    try:
+        return jsonify(add_customer_statement(customer_id, account_id, *statement)), 200
+    except DownloadError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error in pipeline execution: {e}")
         return jsonify({"error": "Error processing the PDF"}), 500
 
+@app.route('/customers/<customer_id>/statements', methods=['GET'])
+def list_statements(customer_id):
+    return jsonify({"customer_id": customer_id, "statements": portfolio_store.statements(customer_id)}), 200
+
+@app.route('/customers/<customer_id>/portfolio', methods=['GET'])
+def get_portfolio(customer_id):
+    """Summary across the customer's accounts; ?from=YYYY-MM&to=YYYY-MM&account=... narrow it."""
+    summary = portfolio_store.summary(
+        customer_id,
+        start_month=request.args.get("from"),
+        end_month=request.args.get("to"),
+        accounts=request.args.getlist("account") or None
+    )
+    if summary is None:
+        return jsonify({"error": "No transactions for this customer"}), 404
+    return jsonify(summary), 200
+
+@app.route('/graphs/<path:filename>', methods=['GET'])
+def serve_graph(filename):
+    """Serves graphs stored with IMAGE_STORAGE=local."""
+    if IMAGE_STORAGE != "local":
+        return jsonify({"error": "Not found"}), 404
+    return send_from_directory(os.path.abspath(LOCAL_STORAGE_FOLDER), filename)
+
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    serving.start_warm_up()
+    app.run(debug=True, port=5000, threaded=True)
@@ -1,104 +1,191 @@
 import os
-import subprocess
-import cloudinary
-import cloudinary.uploader
-from flask import Flask, request, jsonify
+import time
+from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
+from pipeline import run_pipeline, rules_version, statement_cache_key, PERSIST_INTERMEDIATES
+from merchant_rules import current_rules
+from result_cache import ResultCache, file_sha256
+from portfolio import PortfolioStore
+from image_storage import upload_images, check_storage, IMAGE_STORAGE, LOCAL_STORAGE_FOLDER
+from workspace import JobWorkspace, JOBS_FOLDER, sweep_stale_workspaces
+from jobs import JobQueue, QueueFullError, QUEUED
+import metrics
+import serving
 
 app = Flask(__name__)
 CORS(app)
 
+# Request latency histograms and the /metrics endpoint
+metrics.instrument(app)
+
+# GET /ready and /healthz; see serving.py for the gunicorn serving mode
+serving.add_readiness(app)
+
+# Fail at startup, not after the first statement has been processed, if graphs can't be stored
+check_storage()
+
 # Configuration
-app.config['UPLOAD_FOLDER'] = "uploads/"
-app.config['OUTPUT_FOLDER'] = "processed_files/"
-app.config['PYTHON_CMD'] = "python3"  # Use "python" if running in Windows
-
-# Ensure required folders exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
-
-# Configure Cloudinary
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME", "dzedegcng"),
-    api_key=os.getenv("CLOUDINARY_API_KEY", "158983114266962"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET", "DK3w8CiFpTfr-T7D5EoA0122s_Q")
-)
-
-def upload_to_cloudinary(image_path):
-    """Uploads an image to Cloudinary and returns the URL"""
-    if not os.path.exists(image_path):
-        raise FileNotFoundError(f"Image file not found: {image_path}")
-    response = cloudinary.uploader.upload(image_path)
-    return response["secure_url"]  # Public URL for the uploaded image
+app.config['JOBS_FOLDER'] = JOBS_FOLDER
 
-@app.route('/upload', methods=['POST'])
-def upload_file():
+# Ensure required folders exist; workspaces left behind are swept from time to time
+os.makedirs(app.config['JOBS_FOLDER'], exist_ok=True)
+sweep_stale_workspaces(app.config['JOBS_FOLDER'])
+
+# Results of statements we've already processed, keyed by PDF content + rules
+result_cache = ResultCache()
+result_cache.invalidate(keep_rules_version=rules_version())
+
+# Customers' monthly rollups across all the statements they have added
+portfolio_store = PortfolioStore()
+
+def save_uploaded_file():
+    """Saves the uploaded PDF into a new workspace; returns (workspace, error)."""
     if 'file' not in request.files:
-        return jsonify({"error": "No file part"}), 400
+        return None, "No file part"
     file = request.files['file']
     if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
+        return None, "No selected file"
+
+    workspace = JobWorkspace(root=app.config['JOBS_FOLDER'], keep=True).create()
+    file.save(workspace.pdf_path)
+    return workspace, None
+
+def wants_timings():
+    """True when the client asked for a per-stage timing breakdown (?timings=1 or a timings=1 form field)."""
+    return (request.args.get("timings") or request.form.get("timings")) in ("1", "true")
+
+def process_workspace(workspace, timings=False):
+    """Runs the pipeline on a saved PDF and returns the summary & graph URLs.
+
+    With timings, the response also has the seconds spent in each stage.
+    """
+    started = time.perf_counter()
+    with metrics.collect_timings() as breakdown:
+        response = build_workspace_response(workspace)
+    if timings:
+        response["timings"] = metrics.rounded({**breakdown, "total": time.perf_counter() - started})
+    return response
+
+def build_workspace_response(workspace):
+    """The summary & graph URLs for a saved PDF, from the result cache or the pipeline."""
+    try:
+        # Re-uploads of the same statement are answered from the cache
+        pdf_digest = file_sha256(workspace.pdf_path)
+        # One rules snapshot for both the key and the run, even if the rules reload meanwhile
+        rules = current_rules()
+        cache_key = statement_cache_key(pdf_digest, rules=rules)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return {"job_id": workspace.job_id, "cached": True, **cached}
+
+        print(f"🔄 Processing job {workspace.job_id}...")  # Start message
+        result = run_pipeline(workspace.pdf_path, workspace=workspace, pdf_digest=pdf_digest, rules=rules)
+        print(f"✅ Job {workspace.job_id} completed successfully!")  # Success message
+
+        # Upload the graphs from memory, all at once; failed uploads come back as None
+        graph_urls = upload_images(result["graph_images"])
+
+        # Return the graphs' URLs and the summary text
+        response = {"summary_text": result["summary_text"], "graphs": graph_urls}
+        # Failed uploads (null URLs) and merchants the LLM failed on are retried on the next upload
+        if not result["unanswered_merchants"] and None not in graph_urls.values():
+            result_cache.set(cache_key, rules.version, response)
+        return {"job_id": workspace.job_id, "cached": False, **response}
+    finally:
+        if not PERSIST_INTERMEDIATES:
+            workspace.cleanup()
+
+def add_workspace_statement(customer_id, account_id, workspace):
+    """Runs the pipeline on a saved PDF and folds it into the customer's portfolio."""
+    try:
+        # The same PDF uploaded twice is recognised before running the pipeline
+        statement_id = file_sha256(workspace.pdf_path)
+        if portfolio_store.has_statement(customer_id, account_id, statement_id):
+            return {"statement_id": statement_id, "already_added": True}
+
+        result = run_pipeline(workspace.pdf_path, workspace=workspace, pdf_digest=statement_id)
+        return portfolio_store.add_statement(customer_id, account_id, result["transactions"], statement_id)
+    finally:
+        if not PERSIST_INTERMEDIATES:
+            workspace.cleanup()
 
-    # Save the uploaded PDF file
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-    file.save(file_path)
+# Background jobs share one bounded worker pool
+job_queue = JobQueue(lambda job_id, workspace, timings: process_workspace(workspace, timings))
 
-    # Process the PDF file (running your Python scripts)
+@app.route('/upload', methods=['POST'])
+def upload_file():
+    workspace, error = save_uploaded_file()
+    if error:
+        return jsonify({"error": error}), 400
+
+    # Process the PDF file in-process
     try:
-        scripts = [
-            "2-convert_pdf_to_excel.py",
-            "3-clean_data.py",
-            "4-categorize_transactions.py",
-            "5-financial_summary.py",
-            "6-generate_graphs.py"
-        ]
-
-        for script in scripts:
-            print(f"🔄 Running: {script}...")  # Start message
-            result = subprocess.run([app.config['PYTHON_CMD'], script, file_path], capture_output=True, text=True)
-
-        if result.returncode != 0:
-            print(f"❌ Error in {script}: {result.stderr}")  # Error message
-            raise subprocess.CalledProcessError(result.returncode, script, result.stderr)
-    
-        print(f"✅ {script} completed successfully!")  # Success message
-
-        # Paths to the generated graphs
-        graph_paths = {
-            "income_vs_expenses": os.path.join(app.config['OUTPUT_FOLDER'], "monthly_income_vs_expenses.png"),
-            "monthly_savings": os.path.join(app.config['OUTPUT_FOLDER'], "monthly_savings.png"),
-            "expenses_by_category": os.path.join(app.config['OUTPUT_FOLDER'], "expenses_by_category.png")
-        }
-
-        # Upload the graphs to Cloudinary and get their URLs
-        graph_urls = {}
-        for name, path in graph_paths.items():
-            try:
-                graph_urls[name] = upload_to_cloudinary(path)
-            except FileNotFoundError as e:
-                print(f"Graph not found: {e}")
-                graph_urls[name] = None
-
-        # Read the financial summary from the generated text file
-        summary_file = os.path.join(app.config['OUTPUT_FOLDER'], "financial_summary.txt")
-        summary_text = "Summary not available"
-        if os.path.exists(summary_file):
-            with open(summary_file, "r") as f:
-                summary_text = f.read()
-
-        # Return the response with the graphs' URLs and the summary text
-        return jsonify({
-            "summary_text": summary_text,
-            "graphs": graph_urls
-        }), 200
-
-    except subprocess.CalledProcessError as e:
+        return jsonify(process_workspace(workspace, wants_timings())), 200
+    except Exception as e:
         print(f"Error during processing: {e}")
         return jsonify({"error": "Error processing the file", "details": str(e)}), 500
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queues an uploaded PDF for processing and returns its job ID immediately."""
+    workspace, error = save_uploaded_file()
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        job_queue.submit(workspace, wants_timings(), job_id=workspace.job_id)
+    except QueueFullError as e:
+        workspace.cleanup()
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+
+    return jsonify({"job_id": workspace.job_id, "status": QUEUED}), 202, {"Location": f"/jobs/{workspace.job_id}"}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Returns the job's status, plus the summary & graph URLs once it succeeded."""
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job), 200
+
+@app.route('/customers/<customer_id>/statements', methods=['POST'])
+def add_statement(customer_id):
+    """Adds an uploaded statement to the customer's portfolio; overlapping transactions are counted once."""
+    workspace, error = save_uploaded_file()
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        return jsonify(add_workspace_statement(customer_id, request.form.get("account_id", "default"), workspace)), 200
     except Exception as e:
-        print(f"Unexpected error: {e}")
-        return jsonify({"error": "Unexpected error processing the file"}), 500
+        print(f"Error during processing: {e}")
+        return jsonify({"error": "Error processing the file", "details": str(e)}), 500
+
+@app.route('/customers/<customer_id>/statements', methods=['GET'])
+def list_statements(customer_id):
+    return jsonify({"customer_id": customer_id, "statements": portfolio_store.statements(customer_id)}), 200
+
+@app.route('/customers/<customer_id>/portfolio', methods=['GET'])
+def get_portfolio(customer_id):
+    """Summary across the customer's accounts; ?from=YYYY-MM&to=YYYY-MM&account=... narrow it."""
+    summary = portfolio_store.summary(
+        customer_id,
+        start_month=request.args.get("from"),
+        end_month=request.args.get("to"),
+        accounts=request.args.getlist("account") or None
+    )
+    if summary is None:
+        return jsonify({"error": "No transactions for this customer"}), 404
+    return jsonify(summary), 200
+
+@app.route('/graphs/<path:filename>', methods=['GET'])
+def serve_graph(filename):
+    """Serves graphs stored with IMAGE_STORAGE=local."""
+    if IMAGE_STORAGE != "local":
+        return jsonify({"error": "Not found"}), 404
+    return send_from_directory(os.path.abspath(LOCAL_STORAGE_FOLDER), filename)
 
 if __name__ == "__main__":
     print("Starting Flask server...")
-    app.run(debug=True, port=5001)  # Start the Flask app in debug mode
\ No newline at end of file
+    serving.start_warm_up()
+    app.run(debug=True, port=5001)  # Start the Flask app in debug mode
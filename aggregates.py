@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+from statement_store import parse_amounts
+
+class StatementAggregates:
+    """Totals, monthly and per-category figures of a statement, shared by the summary and graphs."""
+
+    def __init__(self, groups):
+        # One row per (Month, Category) with summed metrics; everything below rolls it up
+        self.groups = groups
+
+        self.income = groups['deposits'].sum()
+        self.expenditure = groups['withdrawals'].sum()
+        self.savings = self.income - self.expenditure
+
+        dated = groups[groups.index.get_level_values('Month').notna()]
+        monthly = dated.groupby(level='Month').sum()
+        monthly['savings'] = monthly['deposits'] - monthly['withdrawals']
+        monthly['balance_mean'] = monthly['balance'] / monthly['rows']
+        self.monthly = monthly[['deposits', 'withdrawals', 'savings', 'balance_mean']]
+
+        categorized = groups[groups.index.get_level_values('Category').notna()]
+        by_category = categorized.groupby(level='Category', observed=True)[['expenses', 'expense_rows']].sum()
+        self.expenses_by_category = by_category.loc[by_category['expense_rows'] > 0, 'expenses']
+
+    @property
+    def savings_ratio(self):
+        """Savings as a percentage of income."""
+        return (self.savings / self.income) * 100 if self.income != 0 else 0
+
+    @property
+    def average_monthly_balance(self):
+        return self.monthly['balance_mean'].mean()
+
+    @property
+    def average_monthly_expenses(self):
+        return self.monthly['withdrawals'].mean()
+
+def amounts(df, column):
+    """Float amounts with blanks as zero; a missing column is all zeros."""
+    if column not in df.columns:
+        return np.zeros(len(df))
+    return np.nan_to_num(parse_amounts(df[column]).to_numpy(dtype='float64'))
+
+def aggregate_statement(df):
+    """Computes every summary and chart figure in one grouped pass over the transactions.
+
+    Rows are bucketed by integer (month, category) codes and each metric is
+    summed with np.bincount, so the whole statement is scanned once.
+    """
+    dates = df['Date']
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors='coerce')
+
+    # Month codes relative to the first month; undated rows get the extra last slot
+    months = dates.to_numpy().astype('datetime64[M]')
+    dated = ~np.isnat(months)
+    month_numbers = months.astype('int64')
+    first_month = month_numbers[dated].min() if dated.any() else 0
+    month_count = int(month_numbers[dated].max() - first_month + 1) if dated.any() else 0
+    month_codes = np.where(dated, month_numbers - first_month, month_count)
+
+    # Category codes; uncategorized rows get the extra last slot
+    if 'Category' in df.columns:
+        category_codes, category_labels = pd.factorize(df['Category'])
+        category_labels = np.asarray(category_labels, dtype=object)
+    else:
+        category_codes, category_labels = np.full(len(df), -1), np.array([], dtype=object)
+    category_count = len(category_labels)
+    category_codes = np.where(category_codes < 0, category_count, category_codes)
+
+    slots = (month_count + 1) * (category_count + 1)
+    keys = month_codes * (category_count + 1) + category_codes
+
+    withdrawals = amounts(df, 'Withdrawal Amt.')
+    spent = withdrawals > 0
+    metrics = {
+        'deposits': amounts(df, 'Deposit Amt.'),
+        'withdrawals': withdrawals,
+        'expenses': np.where(spent, withdrawals, 0),
+        'expense_rows': spent,
+        'balance': amounts(df, 'Closing Balance')
+    }
+    rows = np.bincount(keys, minlength=slots)
+    used = np.flatnonzero(rows)
+    sums = {name: np.bincount(keys, weights=values, minlength=slots)[used] for name, values in metrics.items()}
+    sums['rows'] = rows[used]
+
+    month_labels = pd.DatetimeIndex(
+        np.append((first_month + np.arange(month_count)).astype('datetime64[M]'), np.datetime64('NaT'))
+    ).to_period('M')
+    category_labels = np.append(category_labels, None)
+    index = pd.MultiIndex.from_arrays(
+        [month_labels.take(used // (category_count + 1)), category_labels[used % (category_count + 1)]],
+        names=['Month', 'Category']
+    )
+    return StatementAggregates(pd.DataFrame(sums, index=index))
@@ -0,0 +1,103 @@
+"""Chart rendering throughput: old pyplot state machine vs. chart_render.
+
+Reports charts/second and charts/second per core for a synthetic
+24-month statement. Run from the repository root:
+    python -m benchmarks.bench_chart_render [--statements 10] [--format png]
+"""
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+import chart_render
+from aggregates import aggregate_statement
+
+def synthetic_statement(rows=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Date": pd.to_datetime("2023-01-01") + pd.to_timedelta(rng.integers(0, 730, rows), unit="D"),
+        "Withdrawal Amt.": np.where(rng.random(rows) < 0.7, rng.integers(1, 5000, rows).astype(float), np.nan),
+        "Deposit Amt.": np.where(rng.random(rows) < 0.3, rng.integers(1, 9000, rows).astype(float), np.nan),
+        "Closing Balance": rng.integers(1000, 90000, rows).astype(float),
+        "Category": rng.choice(["FOOD", "RENT", "TRAVEL", "SHOPPING", "BILLS", "FUEL", "HEALTH", "Other Expenses"], rows)
+    })
+
+def render_pyplot(aggregates, image_format):
+    # The previous pyplot implementation, kept for comparison
+    monthly = aggregates.monthly
+    months = monthly.index.astype(str)
+    images = []
+
+    plt.figure(figsize=(10, 6))
+    plt.plot(months, monthly['deposits'], label='Income', marker='o', color='blue')
+    plt.plot(months, monthly['withdrawals'], label='Expenses', marker='o', color='red')
+    plt.title('Monthly Income vs Monthly Expenses')
+    plt.legend()
+    plt.grid()
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    images.append(io.BytesIO())
+    plt.savefig(images[-1], format=image_format)
+    plt.close()
+
+    plt.figure(figsize=(10, 6))
+    plt.bar(months, monthly['savings'], color='green')
+    plt.title('Monthly Savings')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    images.append(io.BytesIO())
+    plt.savefig(images[-1], format=image_format)
+    plt.close()
+
+    plt.figure(figsize=(8, 8))
+    expense_categories = aggregates.expenses_by_category
+    plt.pie(expense_categories, labels=expense_categories.index, autopct='%1.1f%%', startangle=140)
+    plt.title('Expenses by Category')
+    plt.tight_layout()
+    images.append(io.BytesIO())
+    plt.savefig(images[-1], format=image_format)
+    plt.close()
+    return images
+
+def charts_per_second(render, statements):
+    render()  # warm up fonts and caches
+    start = time.perf_counter()
+    for _ in range(statements):
+        render()
+    return statements * len(chart_render.CHARTS) / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--statements", type=int, default=10)
+    parser.add_argument("--format", default="png", choices=["png", "svg"])
+    args = parser.parse_args()
+
+    aggregates = aggregate_statement(synthetic_statement())
+    cores = os.cpu_count() or 1
+    print(f"{args.statements} statements x {len(chart_render.CHARTS)} charts, {args.format}, {cores} cores")
+    print(f"{'renderer':<28} {'charts/s':>9} {'per core':>9}")
+
+    def report(label, rate, used_cores=1):
+        print(f"{label:<28} {rate:>9.1f} {rate / used_cores:>9.1f}")
+
+    report("pyplot, sequential", charts_per_second(lambda: render_pyplot(aggregates, args.format), args.statements))
+    report("figure API, sequential",
+           charts_per_second(lambda: chart_render.render_charts(aggregates, args.format, workers=1), args.statements))
+    report("figure API, 3 threads",
+           charts_per_second(lambda: chart_render.render_charts(aggregates, args.format, workers=3), args.statements),
+           min(3, cores))
+
+    # Several statements rendering at once, as under the backend's job queue
+    for workers in sorted({2, 4, cores} & set(range(2, cores + 1))):
+        with ThreadPoolExecutor(workers) as pool:
+            def render_batch():
+                list(pool.map(lambda _: chart_render.render_charts(aggregates, args.format, workers=1), range(workers)))
+            rate = charts_per_second(render_batch, max(1, args.statements // workers)) * workers
+        report(f"{workers} statements at once", rate, workers)
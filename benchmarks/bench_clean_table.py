@@ -0,0 +1,77 @@
+"""Old row-by-row clean_table vs. the vectorized one on a synthetic statement.
+
+Run from the repository root:
+    python -m benchmarks.bench_clean_table [rows]
+"""
+import importlib
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+clean_stage = importlib.import_module("3-clean_data")
+
+COLUMNS = ["Date", "Narration", "Chq./Ref.No.", "Value Dt", "Withdrawal Amt.", "Deposit Amt.", "Closing Balance"]
+
+def clean_table_iterrows(df, column_names):
+    # The original implementation, kept for comparison
+    df = df.dropna(how='all')
+    df.columns = column_names
+
+    cleaned_rows = []
+    current_row = None
+
+    for _, row in df.iterrows():
+        if pd.notna(row['Date']):
+            if current_row is not None:
+                cleaned_rows.append(current_row)
+            current_row = row.copy()
+        else:
+            if current_row is not None and pd.notna(row['Narration']):
+                current_narration = str(current_row['Narration']).strip()
+                additional_narration = str(row['Narration']).strip()
+                if additional_narration:
+                    current_row['Narration'] = f"{current_narration} {additional_narration}"
+
+    if current_row is not None:
+        cleaned_rows.append(current_row)
+
+    return pd.DataFrame(cleaned_rows)
+
+def synthetic_sheet(rows, seed=0):
+    """Raw sheet rows: ~30% continuation lines, some blank and whitespace-only ones."""
+    rng = np.random.default_rng(seed)
+    kind = rng.choice(["txn", "cont", "blank", "space"], size=rows, p=[0.65, 0.3, 0.03, 0.02])
+    kind[0] = "cont"  # a stray line before the first transaction
+    dates = pd.date_range("2023-01-01", periods=rows, freq="5min").strftime("%d/%m/%y")
+
+    data = {c: [np.nan] * rows for c in COLUMNS}
+    for i, k in enumerate(kind):
+        if k == "txn":
+            data["Date"][i] = dates[i]
+            data["Narration"][i] = f"UPI-MERCHANT {i % 500}-{i}@OKAXIS-ICIC0000{i % 10}-{i * 7}"
+            data["Withdrawal Amt."][i] = f"{rng.integers(1, 50_000):,}.00"
+            data["Closing Balance"][i] = f"{rng.integers(1, 500_000):,}.00"
+        elif k == "cont":
+            data["Narration"][i] = f"  PAYMENT FROM PHONE {i}  "
+        elif k == "space":
+            data["Narration"][i] = "   "
+    return pd.DataFrame({i: data[c] for i, c in enumerate(COLUMNS)})
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    sheet = synthetic_sheet(rows)
+
+    start = time.perf_counter()
+    old = clean_table_iterrows(sheet.copy(), COLUMNS)
+    old_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = clean_stage.clean_table(sheet.copy(), COLUMNS)
+    new_seconds = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(old, new, check_dtype=False)
+    print(f"rows: {rows:,}  transactions: {len(new):,}")
+    print(f"iterrows:   {old_seconds:8.3f}s")
+    print(f"vectorized: {new_seconds:8.3f}s  ({old_seconds / new_seconds:.0f}x faster)")
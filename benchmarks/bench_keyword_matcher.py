@@ -0,0 +1,63 @@
+"""Per-narration cost of KeywordMatcher vs. a linear keyword scan.
+
+Run from the repository root:
+    python -m benchmarks.bench_keyword_matcher
+"""
+import random
+import string
+import time
+
+from keyword_matcher import KeywordMatcher
+
+TABLE_SIZES = [150, 1_000, 10_000, 50_000]
+NARRATIONS = 2_000
+
+def random_word(rng, length):
+    return "".join(rng.choice(string.ascii_uppercase) for _ in range(length))
+
+def make_table(rng, size):
+    table = {}
+    while len(table) < size:
+        words = [random_word(rng, rng.randint(3, 8)) for _ in range(rng.randint(1, 2))]
+        table[" ".join(words)] = rng.choice(["INCOME", "LIABILITIES", "DISCRETIONARY_EXPENSES"])
+    return table
+
+def make_narrations(rng, table):
+    keywords = list(table)
+    narrations = []
+    for i in range(NARRATIONS):
+        merchant = rng.choice(keywords) if i % 2 else random_word(rng, 10)
+        narrations.append(f"UPI-{merchant}-{random_word(rng, 8)}@OKAXIS-ICIC0000{i % 100}-{rng.randint(10**11, 10**12)}-UPI")
+    return narrations
+
+def linear_scan(table, narration):
+    # Same priority as KeywordMatcher: longest keyword, then table order
+    best = None
+    for index, (keyword, category) in enumerate(table.items()):
+        if keyword in narration:
+            rank = (-len(keyword), index)
+            if best is None or rank < best[0]:
+                best = (rank, category)
+    return best[1] if best else None
+
+def time_per_row(func, narrations):
+    start = time.perf_counter()
+    results = [func(n) for n in narrations]
+    return (time.perf_counter() - start) / len(narrations) * 1e6, results
+
+if __name__ == "__main__":
+    rng = random.Random(42)
+    print(f"{'keywords':>10} {'build ms':>10} {'matcher us/row':>15} {'linear us/row':>15}")
+    for size in TABLE_SIZES:
+        table = make_table(rng, size)
+        narrations = make_narrations(rng, table)
+
+        start = time.perf_counter()
+        matcher = KeywordMatcher(table)
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        matcher_us, matcher_results = time_per_row(matcher.category, narrations)
+        linear_us, linear_results = time_per_row(lambda n: linear_scan(table, n), narrations[:200])
+        assert matcher_results[:200] == linear_results, "matcher and linear scan disagree"
+
+        print(f"{size:>10,} {build_ms:>10.1f} {matcher_us:>15.1f} {linear_us:>15.1f}")
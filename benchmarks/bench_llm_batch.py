@@ -0,0 +1,98 @@
+"""Unknown-merchant classification against a local fake LLM.
+
+Compares one prompt per merchant with batched, concurrent prompts, with a
+fixed per-call latency and occasional rate-limit errors. Run from the
+repository root:
+    python -m benchmarks.bench_llm_batch
+"""
+import json
+import random
+import re
+import threading
+import time
+
+import llm_batch
+from llm_batch import CATEGORIES, classify_merchants
+from merchant_cache import MerchantCache
+
+MERCHANTS = 200
+LATENCY = 0.05
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+class RateLimitError(Exception):
+    status_code = 429
+
+class FakeLLM:
+    """Stands in for ChatGroq: fixed latency, deterministic answers, optional 429s."""
+
+    def __init__(self, latency=LATENCY, rate_limit_every=0):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def category_for(self, name):
+        return CATEGORIES[sum(map(ord, name)) % len(CATEGORIES)]
+
+    def invoke(self, prompt):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            if self.rate_limit_every and call % self.rate_limit_every == 0:
+                raise RateLimitError("rate limit exceeded")
+
+            names = re.findall(r"^- (.+)$", prompt, re.MULTILINE)
+            if names:
+                return FakeResponse(json.dumps({n: self.category_for(n) for n in names}))
+            name = re.search(r"Is '(.+?)' a business", prompt).group(1)
+            return FakeResponse(self.category_for(name))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+def sequential(merchants, llm):
+    # The old behaviour: one prompt per row, duplicates included
+    return {m: llm.invoke(f"Is '{m}' a business/company name or a person's name?").content for m in merchants}
+
+def run(label, func):
+    start = time.perf_counter()
+    func()
+    print(f"{label:<40} {time.perf_counter() - start:>8.2f}s")
+
+if __name__ == "__main__":
+    llm_batch.BASE_DELAY = 0.01
+    rng = random.Random(7)
+    unique = [f"MERCHANT {i}" for i in range(MERCHANTS)]
+    merchants = unique + [rng.choice(unique) for _ in range(MERCHANTS // 2)]
+
+    llm = FakeLLM()
+    run(f"sequential ({len(merchants)} rows)", lambda: sequential(merchants, llm))
+    print(f"  calls={llm.calls}")
+
+    for batch_size, concurrency in [(1, 8), (25, 1), (25, 4)]:
+        llm = FakeLLM()
+        run(f"batch={batch_size} concurrency={concurrency}",
+            lambda: classify_merchants(merchants, llm, batch_size=batch_size, max_concurrency=concurrency))
+        print(f"  calls={llm.calls} max_in_flight={llm.max_in_flight}")
+
+    llm = FakeLLM(rate_limit_every=3)
+    results = {}
+    run("batch=25 concurrency=4, every 3rd call 429",
+        lambda: results.update(classify_merchants(merchants, llm, batch_size=25, max_concurrency=4)))
+    assert all(results[m] == llm.category_for(m) for m in unique), "retries lost answers"
+    print(f"  calls={llm.calls}")
+
+    cache = MerchantCache(":memory:")
+    classify_merchants(merchants, FakeLLM(), cache=cache)
+    llm = FakeLLM()
+    run("warm cache", lambda: classify_merchants(merchants, llm, cache=cache))
+    print(f"  calls={llm.calls} {cache.stats()}")
@@ -0,0 +1,77 @@
+"""Local PDF extraction throughput (pages/second) against worker count.
+
+Uses the given statement PDF, or generates a synthetic one (needs
+reportlab). Run from the repository root:
+    python -m benchmarks.bench_pdf_extract [statement.pdf] [--pages 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pdf_extract
+
+COLUMNS = [("Date", 30, "l"), ("Narration", 85, "l"), ("Chq./Ref.No.", 380, "l"), ("Value Dt", 500, "l"),
+           ("Withdrawal Amt.", 640, "r"), ("Deposit Amt.", 720, "r"), ("Closing Balance", 810, "r")]
+
+def write_synthetic_pdf(path, pages):
+    """Writes a text-layer statement with ~45 lines per page and multi-line narrations."""
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfgen import canvas
+
+    width, height = landscape(A4)
+    pdf = canvas.Canvas(path, pagesize=(width, height))
+    balance = 100_000.0
+    i = 0
+    for page in range(pages):
+        pdf.setFont("Helvetica-Bold", 8)
+        for name, x, align in COLUMNS:
+            (pdf.drawString if align == "l" else pdf.drawRightString)(x, height - 60, name)
+        pdf.setFont("Helvetica", 8)
+        y = height - 80
+        while y > 60:
+            amount = 100 + (i * 37) % 4900
+            balance -= amount
+            date = f"{i // 40 % 28 + 1:02d}/{i // 1120 % 12 + 1:02d}/23"
+            pdf.drawString(30, y, date)
+            pdf.drawString(85, y, f"UPI-MERCHANT {i % 97}-merchant{i}@okaxis-ICIC0000{i % 9}-{300000 + i}")
+            pdf.drawString(380, y, f"000{300000 + i}")
+            pdf.drawString(500, y, date)
+            pdf.drawRightString(640, y, f"{amount:,.2f}")
+            pdf.drawRightString(810, y, f"{balance:,.2f}")
+            y -= 11
+            if i % 3 == 0 and y > 60:
+                pdf.drawString(85, y, f"PAYMENT FOR ORDER {i}")
+                y -= 11
+            i += 1
+        pdf.drawString(30, 30, f"Page {page + 1} of {pages}")
+        pdf.showPage()
+    pdf.save()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf", nargs="?")
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = args.pdf
+        if path is None:
+            path = os.path.join(folder, "synthetic.pdf")
+            write_synthetic_pdf(path, args.pages)
+
+        with pdf_extract.open_pdf(path) as pdf:
+            pages = len(pdf.pages)
+
+        cores = os.cpu_count() or 1
+        worker_counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+        print(f"{pages} pages, {cores} cores")
+        print(f"{'workers':>8} {'seconds':>9} {'pages/s':>9} {'rows':>7}")
+        for workers in worker_counts:
+            # Warm the pool so process start-up is not counted
+            if workers > 1:
+                pdf_extract.get_executor(workers).submit(os.getpid).result()
+            start = time.perf_counter()
+            rows = sum(len(df) for df in pdf_extract.extract_sheets(path, workers=workers).values())
+            seconds = time.perf_counter() - start
+            print(f"{workers:>8} {seconds:>9.2f} {pages / seconds:>9.1f} {rows:>7}")
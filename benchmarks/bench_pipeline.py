@@ -0,0 +1,151 @@
+"""Time and peak memory of every pipeline stage on synthetic statements.
+
+Each stage runs twice per statement size: once timed, once under
+tracemalloc for its peak memory (Python and NumPy allocations above what
+was live when it started). The categorizer's LLM is replaced by the fake
+one from bench_llm_batch with no latency, so the numbers are the
+pipeline's own cost; LLM batching is measured by bench_llm_batch.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline [--rows 100 10000 100000] [--xlsx]
+    python -m benchmarks.bench_pipeline --save baseline.json
+    python -m benchmarks.bench_pipeline --compare baseline.json   # exits 1 on a regression
+"""
+import argparse
+import gc
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+from aggregates import aggregate_statement
+from benchmarks.bench_llm_batch import FakeLLM
+from benchmarks.synthetic_statement import generate_sheets, write_xlsx, write_csv, read_csv_sheets
+from merchant_cache import MerchantCache
+
+clean_stage = importlib.import_module("3-clean_data")
+summary_stage = importlib.import_module("5-financial_summary")
+graphs_stage = importlib.import_module("6-generate_graphs")
+
+ROWS = [100, 10_000, 100_000]
+
+# A stage this much slower (or hungrier) than the baseline is a regression
+THRESHOLD = 1.25
+
+# Stages faster than this are too noisy to compare
+MIN_SECONDS = 0.1
+
+def new_categorizer(categorize_stage):
+    # The ChatGroq client is never called, it only needs a key to be built
+    os.environ.setdefault("GROK_API_KEY", "benchmark")
+    categorizer = categorize_stage.UPITransactionCategorizer(cache=MerchantCache(":memory:"))
+    categorizer.llm = FakeLLM(latency=0)
+    return categorizer
+
+def measure(func):
+    """Runs func twice: returns (result, seconds, peak bytes above the starting allocation)."""
+    gc.collect()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+
+    del result
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def stages(rows, xlsx, folder, categorize_stage):
+    """(stage name, function) pairs; each function may use the outputs of the ones before it."""
+    outputs = {}
+    steps = [("generate", lambda: generate_sheets(rows))]
+
+    if xlsx:
+        xlsx_path = os.path.join(folder, f"statement_{rows}.xlsx")
+        steps.append(("write xlsx", lambda: write_xlsx(outputs["generate"], xlsx_path)))
+        steps.append(("read xlsx", lambda: pd.read_excel(xlsx_path, sheet_name=None, engine="openpyxl", header=None)))
+    csv_path = os.path.join(folder, f"statement_{rows}.csv")
+    steps.append(("write csv", lambda: write_csv(outputs["generate"], csv_path)))
+    steps.append(("read csv", lambda: read_csv_sheets(csv_path)))
+
+    steps.append(("clean", lambda: clean_stage.clean_sheets(outputs["generate"])))
+    if categorize_stage is not None:
+        steps.append(("categorize",
+                      lambda: categorize_stage.categorize_transactions(outputs["clean"], new_categorizer(categorize_stage))))
+    def transactions():
+        # Without the categorizer, later stages run on the cleaned rows under one category
+        if "categorize" not in outputs:
+            outputs["categorize"] = outputs["clean"].assign(Category="OTHERS")
+        return outputs["categorize"]
+    steps.append(("aggregate", lambda: aggregate_statement(transactions())))
+    steps.append(("summarize", lambda: summary_stage.financial_summary(transactions(), outputs["aggregate"])))
+    steps.append(("graphs", lambda: graphs_stage.render_graphs(transactions(), outputs["aggregate"])))
+
+    for name, func in steps:
+        outputs[name], seconds, peak = measure(func)
+        yield name, seconds, peak
+
+def compare(results, baseline, threshold):
+    """Prints stages slower or hungrier than the baseline by more than threshold; returns how many."""
+    regressions = 0
+    for rows, measured in results.items():
+        for stage, (seconds, peak) in measured.items():
+            before = baseline.get(rows, {}).get(stage)
+            if before is None:
+                continue
+            slower = seconds > MIN_SECONDS and seconds > before[0] * threshold
+            hungrier = peak > before[1] * threshold and peak - before[1] > 1024 * 1024
+            if slower or hungrier:
+                regressions += 1
+                print(f"❌ {stage} at {rows} rows: {before[0]:.3f}s -> {seconds:.3f}s, "
+                      f"{before[1] / 2**20:.1f} -> {peak / 2**20:.1f} MB")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=ROWS, help="transactions per statement, up to 1,000,000")
+    parser.add_argument("--xlsx", action="store_true", help="also time writing and reading the workbook (slow)")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON from --save; exit 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    # Date parsing warns once per statement; it is not what is being measured
+    warnings.simplefilter("ignore", UserWarning)
+
+    try:
+        categorize_stage = importlib.import_module("4-categorize_transactions")
+    except ImportError as e:
+        print(f"⚠️ Skipping categorize: {e}")
+        categorize_stage = None
+
+    results = {}
+    print(f"{'rows':>9}  {'stage':<12} {'seconds':>9} {'rows/s':>12} {'peak MB':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in args.rows:
+            results[str(rows)] = {}
+            for stage, seconds, peak in stages(rows, args.xlsx, folder, categorize_stage):
+                results[str(rows)][stage] = (seconds, peak)
+                print(f"{rows:>9,}  {stage:<12} {seconds:>9.3f} {rows / seconds:>12,.0f} {peak / 2**20:>9.1f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"{regressions} regression(s) against {args.compare}")
+            sys.exit(1)
+        print(f"✅ No regressions against {args.compare}")
@@ -0,0 +1,85 @@
+"""Cold start of the stage scripts, the pipeline and the backend.
+
+Each module is imported in a fresh interpreter several times; the median
+wall time is reported with the heaviest packages it pulled in (from
+python -X importtime). With --worker, also reports what a serving
+worker spends preloading and warming up (see serving.py). Run from the
+repository root:
+    python -m benchmarks.bench_startup [--runs 5] [--worker] [module ...]
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = ["3-clean_data", "4-categorize_transactions", "5-financial_summary", "6-generate_graphs",
+           "2-convert_pdf_to_excel", "pipeline", "7-backend"]
+
+# "import time: self [us] | cumulative | imported package"
+IMPORT_LINE = re.compile(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+def import_once(module):
+    """(seconds, stderr) for importing module in a new interpreter; seconds is None if it failed."""
+    code = f"import importlib; importlib.import_module({module!r})"
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    return (seconds if process.returncode == 0 else None), process.stderr
+
+WORKER_CODE = """
+import serving
+preload = serving.preload_modules()
+print(f"preload_modules {preload:.3f}")
+for step, seconds in serving.warm_up().items():
+    print(f"warm_up.{step} {seconds:.3f}")
+"""
+
+def worker_startup():
+    """[(step, seconds)] for a serving worker's preload and warm-up, in a new interpreter."""
+    process = subprocess.run([sys.executable, "-c", WORKER_CODE], capture_output=True, text=True)
+    steps = []
+    for line in process.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[0].startswith(("preload_modules", "warm_up.")):
+            steps.append((parts[0], float(parts[1])))
+    return steps
+
+def heaviest_imports(importtime_output, top=3):
+    """The top-level packages with the largest cumulative import time, as (name, seconds)."""
+    totals = {}
+    for cumulative, indent, name in IMPORT_LINE.findall(importtime_output):
+        if len(indent) == 1:
+            root = name.split(".")[0]
+            totals[root] = totals.get(root, 0) + int(cumulative) / 1e6
+    return sorted(totals.items(), key=lambda item: -item[1])[:top]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--worker", action="store_true", help="also time a serving worker's preload and warm-up")
+    args = parser.parse_args()
+
+    baseline, _ = import_once("sys")
+    print(f"empty interpreter: {baseline:.3f}s")
+    print(f"{'module':<28} {'median':>8}  heaviest imports")
+    for module in args.modules:
+        times = []
+        for _ in range(args.runs):
+            seconds, output = import_once(module)
+            if seconds is None:
+                break
+            times.append(seconds)
+        if not times:
+            error = output.strip().splitlines()[-1] if output.strip() else "failed"
+            print(f"{module:<28} {'-':>8}  unavailable: {error}")
+            continue
+        heavy = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in heaviest_imports(output))
+        print(f"{module:<28} {statistics.median(times):>7.3f}s  {heavy}")
+
+    if args.worker:
+        print("serving worker:")
+        for step, seconds in worker_startup():
+            print(f"  {step:<26} {seconds:>7.3f}s")
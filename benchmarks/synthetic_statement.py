@@ -0,0 +1,176 @@
+"""Deterministic synthetic bank statements, shaped like the converted PDFs.
+
+Rows look like an HDFC statement after PDF conversion: a header row on
+the first sheet, dd/mm/yy dates, amounts as "1,234.00" text, UPI / NEFT /
+IMPS / ACH / ATM / POS / cheque narrations wrapped onto undated
+continuation lines, and pages split across sheets (a wrapped narration
+can continue on the next sheet). The same rows and seed always give the
+same statement.
+
+Run from the repository root to write files:
+    python -m benchmarks.synthetic_statement 100000 --xlsx statement.xlsx --csv statement.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["Date", "Narration", "Chq./Ref.No.", "Value Dt", "Withdrawal Amt.", "Deposit Amt.", "Closing Balance"]
+
+# Raw rows per sheet, like one converted page per sheet
+SHEET_ROWS = 1000
+
+# Narrations longer than this are wrapped onto continuation lines
+WRAP_WIDTH = 32
+
+# Merchants the rules know, plus a long tail the LLM would be asked about
+KNOWN_MERCHANTS = ["SWIGGY", "ZOMATO", "AMAZON", "FLIPKART", "UBER", "OLA", "NETFLIX", "SPOTIFY", "BIGBASKET",
+                   "MYNTRA", "IRCTC", "MAKEMYTRIP", "AIRTEL", "JIO", "BESCOM", "APOLLO PHARMACY", "DMART",
+                   "ZERODHA", "GROWW", "PHONEPE"]
+UNKNOWN_MERCHANTS = [f"SHOP {i}" for i in range(200)]
+PEOPLE = ["RAHUL SHARMA", "PRIYA NAIR", "AMIT KUMAR", "SNEHA REDDY", "VIKRAM SINGH", "ANJALI GUPTA"]
+EMPLOYERS = ["ACME TECHNOLOGIES PVT LTD", "GLOBEX SOLUTIONS", "INITECH INDIA"]
+LENDERS = ["BAJAJ FINANCE LTD", "HDFC BANK LOANS", "LIC OF INDIA"]
+HANDLES = ["OKAXIS", "OKICICI", "YBL", "PAYTM", "OKHDFCBANK"]
+IFSC = ["HDFC0000123", "ICIC0000456", "SBIN0001234", "UTIB0000789", "KKBK0000321"]
+CITIES = ["MUMBAI", "BANGALORE", "DELHI", "PUNE", "CHENNAI"]
+
+# Transaction kind -> (probability, is a deposit)
+KINDS = {
+    "upi": (0.55, False),
+    "upi_in": (0.08, True),
+    "neft_salary": (0.03, True),
+    "neft": (0.06, False),
+    "imps": (0.08, False),
+    "ach": (0.04, False),
+    "atm": (0.05, False),
+    "pos": (0.08, False),
+    "chq": (0.03, True)
+}
+
+def narration(kind, i, rng_choice, ref):
+    """One narration of the given kind; rng_choice picks from a list."""
+    if kind == "upi":
+        merchant = rng_choice(KNOWN_MERCHANTS if i % 3 else UNKNOWN_MERCHANTS)
+        return f"UPI-{merchant}-{merchant.replace(' ', '').lower()}@{rng_choice(HANDLES)}-{rng_choice(IFSC)}-{ref}-UPI"
+    if kind == "upi_in":
+        person = rng_choice(PEOPLE)
+        return f"UPI-{person}-{person.split()[0].lower()}{i % 97}@{rng_choice(HANDLES)}-{rng_choice(IFSC)}-{ref}-SENT"
+    if kind == "neft_salary":
+        return f"NEFT CR-{rng_choice(IFSC)}-{rng_choice(EMPLOYERS)}-SALARY CREDIT-N{ref}"
+    if kind == "neft":
+        return f"NEFT DR-{rng_choice(IFSC)}-{rng_choice(PEOPLE)}-RENT-N{ref}"
+    if kind == "imps":
+        return f"IMPS-{ref}-{rng_choice(PEOPLE)}-HDFC-XXXXXXXX{i % 10000:04d}-TRANSFER"
+    if kind == "ach":
+        return f"ACH D-{rng_choice(LENDERS)}-EMI{ref[-8:]}"
+    if kind == "atm":
+        return f"ATW-{ref[-6:]}XXXXXX{i % 10000:04d}-{rng_choice(CITIES)}"
+    if kind == "pos":
+        return f"POS {ref[-4:]}XXXXXXXX{i % 10000:04d} {rng_choice(KNOWN_MERCHANTS + UNKNOWN_MERCHANTS[:20])}"
+    return f"CHQ DEP MICR CLG {rng_choice(CITIES)}-MICR {400000 + i % 1000} CLG - NO : {ref[-6:]}"
+
+def wrap(text, width=WRAP_WIDTH):
+    return [text[start:start + width] for start in range(0, len(text), width)] or [""]
+
+def money(values):
+    return [f"{v:,.2f}" for v in values]
+
+def generate_statement(rows, seed=0):
+    """The statement's raw lines as one DataFrame of strings (None for empty cells), header row first."""
+    rng = np.random.default_rng(seed)
+    kinds = list(KINDS)
+    probabilities = np.array([KINDS[k][0] for k in kinds])
+    kind_codes = rng.choice(len(kinds), size=rows, p=probabilities / probabilities.sum())
+    deposit = np.array([KINDS[k][1] for k in kinds])[kind_codes]
+
+    # Dates in order, about 20 transactions a day, between a month and ten years
+    span_days = int(np.clip(rows // 20, 30, 3650))
+    days = np.sort(rng.integers(0, span_days, size=rows))
+    calendar = (pd.Timestamp("2023-01-01") + pd.to_timedelta(np.arange(span_days), unit="D")).strftime("%d/%m/%y")
+    dates = np.array(calendar, dtype=object)[days]
+
+    amounts = np.round(rng.lognormal(mean=6.5, sigma=1.2, size=rows), 2)
+    salary = np.array(kinds)[kind_codes] == "neft_salary"
+    amounts[salary] = np.round(rng.uniform(60_000, 150_000, size=salary.sum()), 2)
+    balances = 250_000 + np.cumsum(np.where(deposit, amounts, -amounts))
+    amount_text = money(amounts)
+    balance_text = money(balances)
+    refs = [f"{r:012d}" for r in rng.integers(10**11, 10**12, size=rows)]
+
+    # One seeded number per row picks the names inside its narration
+    picks = rng.integers(0, 2**31, size=rows).tolist()
+    wrapped = [
+        wrap(narration(kinds[code], i, lambda items, pick=pick: items[pick % len(items)], refs[i]))
+        for i, (code, pick) in enumerate(zip(kind_codes.tolist(), picks))
+    ]
+
+    # Each transaction is its dated first line followed by its continuation lines
+    line_counts = np.array([len(parts) for parts in wrapped])
+    first_line = np.r_[0, np.cumsum(line_counts)[:-1]]
+    lines = int(line_counts.sum())
+
+    def column(values):
+        data = np.full(lines, None, dtype=object)
+        data[first_line] = values
+        return data
+
+    withdrawals = np.where(deposit, None, np.array(amount_text, dtype=object))
+    deposits = np.where(deposit, np.array(amount_text, dtype=object), None)
+    statement = pd.DataFrame({
+        0: column(dates),
+        1: np.array([part for parts in wrapped for part in parts], dtype=object),
+        2: column(refs),
+        3: column(dates),
+        4: column(withdrawals),
+        5: column(deposits),
+        6: column(balance_text)
+    })
+    header = pd.DataFrame([COLUMNS], dtype=object)
+    return pd.concat([header, statement], ignore_index=True)
+
+def generate_sheets(rows, seed=0, sheet_rows=SHEET_ROWS):
+    """The statement split into {sheet name: raw DataFrame}, as convert_pdf returns it."""
+    statement = generate_statement(rows, seed)
+    return {
+        f"Sheet{number + 1}": statement.iloc[start:start + sheet_rows].reset_index(drop=True)
+        for number, start in enumerate(range(0, len(statement), sheet_rows))
+    }
+
+def write_xlsx(sheets, path):
+    """Writes the sheets to a workbook, streaming rows (openpyxl write-only mode)."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for name, sheet in sheets.items():
+        worksheet = workbook.create_sheet(name)
+        for row in sheet.itertuples(index=False):
+            worksheet.append(list(row))
+    workbook.save(path)
+    return path
+
+def write_csv(sheets, path):
+    """Writes the raw lines of every sheet, in order, to one CSV (the header is its first line)."""
+    pd.concat(sheets.values(), ignore_index=True).to_csv(path, header=False, index=False)
+    return path
+
+def read_csv_sheets(path):
+    """Reads write_csv output back as a single raw sheet."""
+    return {"Sheet1": pd.read_csv(path, header=None, dtype=str)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", type=int, help="transactions, 100 to 1,000,000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sheet-rows", type=int, default=SHEET_ROWS)
+    parser.add_argument("--xlsx")
+    parser.add_argument("--csv")
+    args = parser.parse_args()
+
+    sheets = generate_sheets(args.rows, args.seed, args.sheet_rows)
+    lines = sum(len(sheet) for sheet in sheets.values())
+    print(f"{args.rows:,} transactions, {lines:,} lines, {len(sheets)} sheets")
+    if args.xlsx:
+        print(f"Saved {write_xlsx(sheets, args.xlsx)}")
+    if args.csv:
+        print(f"Saved {write_csv(sheets, args.csv)}")
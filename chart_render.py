@@ -0,0 +1,98 @@
+"""Statement charts drawn with matplotlib's object-oriented API.
+
+Every chart gets its own Figure on an Agg canvas, so there is no global
+pyplot state and no GUI backend: charts can be drawn from any thread,
+several at a time. Images are rendered into memory as PNG or SVG bytes.
+"""
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads drawing one statement's charts at once (1 = one after another)
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "3"))
+
+_executor = None
+_executor_workers = None
+_executor_lock = threading.Lock()
+
+def new_figure(figsize):
+    """A Figure attached to its own Agg canvas."""
+    # Imported here so loading the pipeline does not pay for matplotlib until a chart is drawn
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure
+
+def income_vs_expenses_chart(aggregates):
+    figure = new_figure((10, 6))
+    ax = figure.add_subplot()
+    months = aggregates.monthly.index.astype(str)
+    ax.plot(months, aggregates.monthly['deposits'], label='Income', marker='o', color='blue')
+    ax.plot(months, aggregates.monthly['withdrawals'], label='Expenses', marker='o', color='red')
+    ax.set_title('Monthly Income vs Monthly Expenses')
+    ax.set_xlabel('Month')
+    ax.set_ylabel('Amount (₹)')
+    ax.legend()
+    ax.grid()
+    ax.tick_params(axis='x', labelrotation=45)
+    figure.tight_layout()
+    return figure
+
+def monthly_savings_chart(aggregates):
+    figure = new_figure((10, 6))
+    ax = figure.add_subplot()
+    ax.bar(aggregates.monthly.index.astype(str), aggregates.monthly['savings'], color='green')
+    ax.set_title('Monthly Savings')
+    ax.set_xlabel('Month')
+    ax.set_ylabel('Savings (₹)')
+    ax.tick_params(axis='x', labelrotation=45)
+    figure.tight_layout()
+    return figure
+
+def expenses_by_category_chart(aggregates):
+    figure = new_figure((8, 8))
+    ax = figure.add_subplot()
+    expense_categories = aggregates.expenses_by_category
+    ax.pie(expense_categories, labels=expense_categories.index, autopct='%1.1f%%', startangle=140)
+    ax.set_title('Expenses by Category')
+    figure.tight_layout()
+    return figure
+
+# Chart name -> (file name without extension, builder)
+CHARTS = {
+    "income_vs_expenses": ("monthly_income_vs_expenses", income_vs_expenses_chart),
+    "monthly_savings": ("monthly_savings", monthly_savings_chart),
+    "expenses_by_category": ("expenses_by_category", expenses_by_category_chart)
+}
+
+def render_chart(name, aggregates, image_format="png"):
+    """Draws one chart and returns its image bytes."""
+    figure = CHARTS[name][1](aggregates)
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=image_format)
+    return buffer.getvalue()
+
+def get_executor(workers):
+    """Returns the shared chart-drawing thread pool, creating it on first use."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="charts")
+            _executor_workers = workers
+        return _executor
+
+def render_charts(aggregates, image_format="png", workers=None):
+    """Draws every chart and returns {name: (file name, image bytes)}."""
+    workers = CHART_WORKERS if workers is None else workers
+    if workers <= 1:
+        images = {name: render_chart(name, aggregates, image_format) for name in CHARTS}
+    else:
+        executor = get_executor(workers)
+        futures = {name: executor.submit(render_chart, name, aggregates, image_format) for name in CHARTS}
+        images = {name: future.result() for name, future in futures.items()}
+    return {name: (f"{CHARTS[name][0]}.{image_format}", images[name]) for name in CHARTS}
@@ -0,0 +1,94 @@
+import hashlib
+import io
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# Largest statement we accept, and the chunk size it is streamed in
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# (connect, read) seconds; the read timeout applies between chunks,
+# the deadline to the whole download so a slow drip cannot hold a worker
+DOWNLOAD_TIMEOUT = (float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", "5")), float(os.getenv("DOWNLOAD_READ_TIMEOUT", "30")))
+DOWNLOAD_DEADLINE = float(os.getenv("DOWNLOAD_DEADLINE", "120"))
+
+HEADERS = {"User-Agent": "Mozilla/5.0"}  # Some servers block unknown requests
+
+_session = None
+_session_lock = threading.Lock()
+
+class DownloadError(Exception):
+    """Raised when the statement PDF cannot be downloaded."""
+
+class DownloadedFile:
+    """A downloaded file's bytes, with the SHA-256 computed while it streamed in."""
+
+    def __init__(self, data, sha256, content_type):
+        self.data = data
+        self.sha256 = sha256
+        self.content_type = content_type
+
+    def __len__(self):
+        return len(self.data)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.data)
+        return path
+
+def get_session():
+    """Returns the shared download session, so connections to a host are reused."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            _session.headers.update(HEADERS)
+        return _session
+
+def download_pdf(pdf_url, max_bytes=DOWNLOAD_MAX_BYTES, timeout=DOWNLOAD_TIMEOUT, deadline=DOWNLOAD_DEADLINE, session=None):
+    """Streams a PDF into memory, hashing it on the way; raises DownloadError on any failure.
+
+    Oversized files are refused from Content-Length when the server sends
+    it, and cut off at max_bytes when it does not.
+    """
+    with metrics.span("download"):
+        session = session or get_session()
+        started = time.monotonic()
+        try:
+            with session.get(pdf_url, stream=True, timeout=timeout) as response:
+                if response.status_code != 200:
+                    raise DownloadError(f"Failed to download the PDF (status {response.status_code})")
+
+                length = response.headers.get("Content-Length")
+                if length and length.isdigit() and int(length) > max_bytes:
+                    raise DownloadError(f"PDF is larger than {max_bytes} bytes")
+
+                # Ensure it's a PDF by checking headers
+                content_type = response.headers.get("Content-Type", "")
+                if "pdf" not in content_type:
+                    print(f"⚠️ Warning: Content-Type is {content_type}, not a PDF!")
+
+                digest = hashlib.sha256()
+                buffer = io.BytesIO()
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    if buffer.tell() + len(chunk) > max_bytes:
+                        raise DownloadError(f"PDF is larger than {max_bytes} bytes")
+                    if time.monotonic() - started > deadline:
+                        raise DownloadError(f"Download took longer than {deadline:.0f}s")
+                    digest.update(chunk)
+                    buffer.write(chunk)
+        except requests.RequestException as e:
+            raise DownloadError(f"Failed to download the PDF: {e}") from e
+
+    metrics.DOWNLOADED_BYTES.inc(buffer.tell())
+    print(f"✅ PDF downloaded successfully: {buffer.tell()} bytes")
+    return DownloadedFile(buffer.getvalue(), digest.hexdigest(), content_type)
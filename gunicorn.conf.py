@@ -0,0 +1,33 @@
+"""gunicorn settings for the production serving mode (see serving.py).
+
+    gunicorn -c gunicorn.conf.py "7-backend:app"
+"""
+import os
+
+import serving
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# One process per worker, each serving WEB_THREADS requests at once. Job
+# status is shared through the SQLite job store (JOB_STORE_PATH), so any
+# worker can answer GET /jobs/<id>; JOB_STORE=memory needs one worker.
+workers = int(os.getenv("WEB_WORKERS", "1"))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "8"))
+
+# Large statements can take minutes to convert
+timeout = int(os.getenv("WEB_TIMEOUT", "300"))
+graceful_timeout = 30
+
+# Recycle workers now and then; they fork from the warm master, so it is cheap
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "1000"))
+max_requests_jitter = 100
+
+# The app itself (SQLite connections, thread pools) is loaded in each worker
+preload_app = False
+
+# Heavy libraries are imported once here, in the master, and inherited by every worker
+serving.preload_modules()
+
+def post_worker_init(worker):
+    serving.start_warm_up()
@@ -0,0 +1,201 @@
+"""Where rendered chart images go, and the URLs clients get back.
+
+Images are uploaded straight from memory, concurrently, with timeouts
+and retries. IMAGE_STORAGE picks the backend:
+    cloudinary  signed uploads to Cloudinary over one pooled HTTP session
+    local       files under LOCAL_STORAGE_FOLDER, served by the backend
+    inline      no upload; data: URLs in the response
+    fake        kept in memory, for tests and benchmarks
+"""
+import base64
+import hashlib
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+IMAGE_STORAGE = os.getenv("IMAGE_STORAGE", "cloudinary")
+
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "3"))
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", "3"))
+# (connect, read) seconds per upload attempt
+UPLOAD_TIMEOUT = (float(os.getenv("UPLOAD_CONNECT_TIMEOUT", "5")), float(os.getenv("UPLOAD_READ_TIMEOUT", "30")))
+BASE_DELAY = 0.5
+MAX_DELAY = 8.0
+
+LOCAL_STORAGE_FOLDER = os.getenv("LOCAL_STORAGE_FOLDER", "static/graphs")
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "/graphs/")
+
+CONTENT_TYPES = {".png": "image/png", ".svg": "image/svg+xml"}
+
+_storage = None
+_storage_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+class UploadError(Exception):
+    """Raised when an upload fails in a way that retrying may fix."""
+
+def content_type(filename):
+    return CONTENT_TYPES.get(os.path.splitext(filename)[1].lower(), "application/octet-stream")
+
+def pooled_session(pool_size=UPLOAD_WORKERS * 2):
+    """A requests session whose connections are reused across uploads and threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+CLOUDINARY_SETTINGS = ("CLOUDINARY_CLOUD_NAME", "CLOUDINARY_API_KEY", "CLOUDINARY_API_SECRET")
+
+def require_cloudinary_settings(values):
+    """Raises ValueError naming the Cloudinary settings missing from values ({setting: value})."""
+    missing = [name for name in CLOUDINARY_SETTINGS if not values.get(name)]
+    if missing:
+        raise ValueError(f"IMAGE_STORAGE=cloudinary needs {', '.join(missing)}; set them or use IMAGE_STORAGE=local")
+
+class CloudinaryStorage:
+    """Signed image uploads to Cloudinary's REST API."""
+
+    def __init__(self, cloud_name=None, api_key=None, api_secret=None, session=None, timeout=UPLOAD_TIMEOUT):
+        self.cloud_name = cloud_name or os.getenv("CLOUDINARY_CLOUD_NAME")
+        self.api_key = api_key or os.getenv("CLOUDINARY_API_KEY")
+        self.api_secret = api_secret or os.getenv("CLOUDINARY_API_SECRET")
+        require_cloudinary_settings(dict(zip(CLOUDINARY_SETTINGS, (self.cloud_name, self.api_key, self.api_secret))))
+        self.session = session or pooled_session()
+        self.timeout = timeout
+        self.url = f"https://api.cloudinary.com/v1_1/{self.cloud_name}/image/upload"
+
+    def upload(self, filename, data):
+        timestamp = str(int(time.time()))
+        signature = hashlib.sha1(f"timestamp={timestamp}{self.api_secret}".encode()).hexdigest()
+        try:
+            response = self.session.post(
+                self.url,
+                data={"api_key": self.api_key, "timestamp": timestamp, "signature": signature},
+                files={"file": (filename, data, content_type(filename))},
+                timeout=self.timeout
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise UploadError(str(e)) from e
+
+        if response.status_code == 429 or response.status_code >= 500:
+            raise UploadError(f"Cloudinary returned {response.status_code}")
+        response.raise_for_status()
+        return response.json()["secure_url"]
+
+class LocalStorage:
+    """Writes images under a folder the backend serves; names are content hashes."""
+
+    def __init__(self, folder=LOCAL_STORAGE_FOLDER, base_url=LOCAL_STORAGE_URL):
+        self.folder = folder
+        self.base_url = base_url
+        os.makedirs(folder, exist_ok=True)
+
+    def upload(self, filename, data):
+        stem, extension = os.path.splitext(filename)
+        name = f"{stem}-{hashlib.sha256(data).hexdigest()[:16]}{extension}"
+        path = os.path.join(self.folder, name)
+        if not os.path.exists(path):
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return self.base_url + name
+
+class InlineStorage:
+    """Skips uploading: each image comes back as a data: URL."""
+
+    def upload(self, filename, data):
+        return f"data:{content_type(filename)};base64,{base64.b64encode(data).decode()}"
+
+class FakeStorage:
+    """Keeps uploads in memory, for tests and benchmarks."""
+
+    def __init__(self, delay=0.0, failures=0):
+        self.delay = delay
+        # Number of upload attempts to fail before succeeding
+        self.failures = failures
+        self.images = {}
+        self._lock = threading.Lock()
+
+    def upload(self, filename, data):
+        time.sleep(self.delay)
+        with self._lock:
+            if self.failures > 0:
+                self.failures -= 1
+                raise UploadError("simulated failure")
+            self.images[filename] = data
+        return f"fake://{filename}"
+
+STORAGE_BACKENDS = {
+    "cloudinary": CloudinaryStorage,
+    "local": LocalStorage,
+    "inline": InlineStorage,
+    "fake": FakeStorage
+}
+
+def check_storage(backend=None):
+    """Raises ValueError if the storage backend is unknown or missing settings.
+
+    Nothing is created, so the backends call it at startup, before gunicorn
+    forks, instead of finding out on the first upload.
+    """
+    backend = backend or IMAGE_STORAGE
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown IMAGE_STORAGE '{backend}'")
+    if backend == "cloudinary":
+        require_cloudinary_settings({name: os.getenv(name) for name in CLOUDINARY_SETTINGS})
+
+def get_storage():
+    """Returns the configured storage backend, creating it on first use."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            check_storage()
+            _storage = STORAGE_BACKENDS[IMAGE_STORAGE]()
+        return _storage
+
+def get_executor():
+    """Returns the shared upload thread pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(UPLOAD_WORKERS, 1), thread_name_prefix="uploads")
+        return _executor
+
+def upload_with_retries(storage, filename, data, max_retries=UPLOAD_RETRIES):
+    """Uploads one image, retrying transient failures with jittered backoff; returns its URL or None."""
+    for attempt in range(max_retries + 1):
+        try:
+            url = storage.upload(filename, data)
+            metrics.UPLOADED_BYTES.inc(len(data))
+            return url
+        except UploadError as e:
+            if attempt == max_retries:
+                print(f"Upload of {filename} failed after {attempt + 1} attempts: {e}")
+                return None
+            delay = min(MAX_DELAY, BASE_DELAY * 2 ** attempt)
+            time.sleep(random.uniform(delay / 2, delay))
+        except Exception as e:
+            print(f"Upload of {filename} failed: {e}")
+            return None
+
+def upload_images(images, storage=None):
+    """Uploads {name: (file name, image bytes)} concurrently and returns {name: URL or None}."""
+    storage = storage or get_storage()
+    with metrics.span("upload"):
+        if len(images) <= 1:
+            return {name: upload_with_retries(storage, filename, data) for name, (filename, data) in images.items()}
+
+        executor = get_executor()
+        futures = {name: executor.submit(upload_with_retries, storage, filename, data)
+                   for name, (filename, data) in images.items()}
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,163 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker pool size and how many jobs may wait or run before new ones are rejected
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+
+# Finished jobs are forgotten after this many seconds
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))
+
+# "sqlite" shares job status between all the worker processes on this machine; "memory" keeps it in one process
+JOB_STORE = os.getenv("JOB_STORE", "sqlite")
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "cache/jobs.sqlite3")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+class InMemoryJobStore:
+    """Keeps job status and results in this process.
+
+    Any object with the same create/update/get methods (e.g. SQLiteJobStore,
+    or one backed by Redis) can be passed to JobQueue instead.
+    """
+
+    def __init__(self, result_ttl=JOB_RESULT_TTL):
+        self.result_ttl = result_ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id):
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = {"job_id": job_id, "status": QUEUED, "created_at": time.time()}
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.get("finished_at", time.time()) < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+class SQLiteJobStore:
+    """Keeps job status and results in SQLite, so any worker process can answer GET /jobs/<id>.
+
+    Results are stored as JSON, so handlers must return JSON-serializable values.
+    """
+
+    def __init__(self, path=JOB_STORE_PATH, result_ttl=JOB_RESULT_TTL):
+        self.path = path
+        self.result_ttl = result_ttl
+        self._lock = threading.Lock()
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, job TEXT NOT NULL, finished_at REAL)"
+            )
+
+    def create(self, job_id):
+        job = {"job_id": job_id, "status": QUEUED, "created_at": time.time()}
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE finished_at < ?", (time.time() - self.result_ttl,))
+            self._conn.execute("INSERT OR REPLACE INTO jobs (job_id, job, finished_at) VALUES (?, ?, NULL)",
+                               (job_id, json.dumps(job)))
+
+    def update(self, job_id, **fields):
+        # Only the process running a job updates it, so read-modify-write is safe
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT job FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            job = json.loads(row[0])
+            job.update(fields)
+            self._conn.execute("UPDATE jobs SET job = ?, finished_at = ? WHERE job_id = ?",
+                               (json.dumps(job), job.get("finished_at"), job_id))
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT job FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+JOB_STORES = {
+    "sqlite": SQLiteJobStore,
+    "memory": InMemoryJobStore
+}
+
+def make_job_store(kind=None):
+    """The job store picked by JOB_STORE."""
+    kind = kind or JOB_STORE
+    if kind not in JOB_STORES:
+        raise ValueError(f"Unknown JOB_STORE '{kind}'")
+    return JOB_STORES[kind]()
+
+class JobQueue:
+    """Runs jobs on a bounded worker pool and tracks their status in a store.
+
+    handler(job_id, *args) returns the job result; any exception marks the
+    job as failed. The executor only needs a submit(fn, *args) method, so a
+    synchronous stand-in can replace the thread pool in tests.
+    """
+
+    def __init__(self, handler, max_workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE, store=None, executor=None):
+        self.handler = handler
+        self.store = store or make_job_store()
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._slots = threading.BoundedSemaphore(max_queued)
+
+    def submit(self, *args, job_id=None):
+        """Queues a job and returns its ID, or raises QueueFullError."""
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Job queue is full, try again later")
+
+        job_id = job_id or uuid.uuid4().hex
+        self.store.create(job_id)
+        try:
+            self.executor.submit(self._run, job_id, *args)
+        except Exception:
+            self._slots.release()
+            self.store.update(job_id, status=FAILED, error="Could not schedule job", finished_at=time.time())
+            raise
+        return job_id
+
+    def status(self, job_id):
+        """Returns the job's status dict, or None for an unknown job."""
+        return self.store.get(job_id)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def _run(self, job_id, *args):
+        self.store.update(job_id, status=RUNNING, started_at=time.time())
+        try:
+            result = self.handler(job_id, *args)
+            self.store.update(job_id, status=SUCCEEDED, result=result, finished_at=time.time())
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self.store.update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+        finally:
+            self._slots.release()
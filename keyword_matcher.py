@@ -0,0 +1,78 @@
+from collections import deque
+
+class KeywordMatcher:
+    """Aho–Corasick automaton over a keyword -> category table.
+
+    All keywords are found in a single pass over the text, so the cost per
+    narration depends on its length, not on the size of the table.
+
+    Priority: when several keywords occur in a narration, the longest one
+    wins ("HDFC EMI" beats "EMI", "FD INTEREST" beats "FD"); keywords of
+    equal length are ranked by their order in the table.
+    """
+
+    def __init__(self, keyword_categories):
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]
+        self._keywords = []
+
+        for index, (keyword, category) in enumerate(keyword_categories.items()):
+            if keyword:
+                self._add(keyword, (-len(keyword), index), category)
+        self._build_failure_links()
+
+    def __len__(self):
+        return len(self._keywords)
+
+    def _add(self, keyword, rank, category):
+        state = 0
+        for ch in keyword:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            state = next_state
+
+        self._keywords.append(keyword)
+        if self._best[state] is None or rank < self._best[state][0]:
+            self._best[state] = (rank, keyword, category)
+
+    def _build_failure_links(self):
+        # Breadth-first, so each node's failure target is already final
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(ch, 0)
+
+                # Fold the best keyword reachable through failure links into the node
+                inherited = self._best[self._fail[next_state]]
+                if inherited is not None and (self._best[next_state] is None or inherited[0] < self._best[next_state][0]):
+                    self._best[next_state] = inherited
+                queue.append(next_state)
+
+    def match(self, text):
+        """Returns (keyword, category) for the highest-priority keyword in text, or None."""
+        goto, fail, best = self._goto, self._fail, self._best
+        state = 0
+        found = None
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            candidate = best[state]
+            if candidate is not None and (found is None or candidate[0] < found[0]):
+                found = candidate
+        return (found[1], found[2]) if found else None
+
+    def category(self, text):
+        """Returns the category of the highest-priority keyword in text, or None."""
+        match = self.match(text)
+        return match[1] if match else None
@@ -0,0 +1,148 @@
+import contextvars
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import metrics
+from merchant_cache import normalize_merchant
+
+CATEGORIES = [
+    "SAVINGS_INVESTMENTS", "LIABILITIES", "DISCRETIONARY_EXPENSES", "TRANSPORT_FUEL",
+    "RED_FLAGS", "HEALTHCARE_INSURANCE", "GOVERNMENT_TAX_PAYMENTS", "OTHERS"
+]
+
+# Merchants per prompt and prompts in flight at once
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "25"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+
+BASE_DELAY = 0.5
+MAX_DELAY = 20.0
+
+_unanswered = contextvars.ContextVar("unanswered", default=None)
+
+@contextmanager
+def track_unanswered():
+    """Collects the merchants the LLM failed to answer for inside the block (in this thread).
+
+    Their categories fall back to OTHERS, so results built from them should not be cached.
+    """
+    unanswered = []
+    token = _unanswered.set(unanswered)
+    try:
+        yield unanswered
+    finally:
+        _unanswered.reset(token)
+
+def build_prompt(merchants):
+    """Builds one prompt asking for a JSON category for every merchant."""
+    names = "\n".join(f"- {m}" for m in merchants)
+    return ("These names come from UPI bank transactions. For each one decide whether it is a "
+            "business/company name or a person's name. For a person's name return OTHERS. "
+            "If it's clearly a business, return the category from: " + ", ".join(CATEGORIES[:-1]) + ". "
+            "If unclear, return OTHERS. Respond with only a JSON object mapping each name, "
+            "exactly as given, to its category.\n"
+            f"Names:\n{names}")
+
+def parse_response(text, merchants):
+    """Returns {merchant: category} from the LLM's JSON reply; unknown values become OTHERS."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError(f"No JSON object in LLM response: {text[:200]!r}")
+    answers = {normalize_merchant(k): str(v).strip().upper() for k, v in json.loads(text[start:end + 1]).items()}
+
+    results = {}
+    for merchant in merchants:
+        category = answers.get(normalize_merchant(merchant))
+        if category is not None:
+            results[merchant] = category if category in CATEGORIES else "OTHERS"
+    return results
+
+def is_rate_limited(error):
+    """True if the error looks like an HTTP 429 from the LLM provider."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "rate limit" in str(error).lower()
+
+def retry_delay(attempt, error):
+    """Exponential backoff with jitter; honours Retry-After on rate limits."""
+    delay = min(MAX_DELAY, BASE_DELAY * 2 ** attempt)
+    if is_rate_limited(error):
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            delay = max(delay, float(headers.get("retry-after", 0)))
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(delay / 2, delay)
+
+def classify_batch(llm, merchants, max_retries=LLM_MAX_RETRIES):
+    """Classifies one batch with a single prompt, retrying failed or malformed replies."""
+    prompt = build_prompt(merchants)
+    for attempt in range(max_retries + 1):
+        # error: the call failed; invalid: it answered with something unparseable
+        outcome = "error"
+        try:
+            answer = llm.invoke(prompt).content
+            outcome = "invalid"
+            results = parse_response(answer, merchants)
+            outcome = "ok"
+            return results
+        except Exception as e:
+            if attempt == max_retries:
+                print(f"LLM Error for batch of {len(merchants)} merchants: {e}")
+                return {}
+            time.sleep(retry_delay(attempt, e))
+        finally:
+            metrics.LLM_CALLS.inc(outcome=outcome)
+
+def cached_categories(merchants, cache=None):
+    """Returns ({merchant: cached category}, [distinct merchants not in the cache])."""
+    results = {}
+    pending = []
+    seen = set()
+    for merchant in merchants:
+        key = normalize_merchant(merchant)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        cached = cache.get(merchant) if cache is not None else None
+        # Anything but a known category (e.g. free text from an older writer) is asked again
+        if cached in CATEGORIES:
+            results[merchant] = cached
+        else:
+            pending.append(merchant)
+    return results, pending
+
+def classify_uncached(pending, llm, cache=None, batch_size=LLM_BATCH_SIZE, max_concurrency=LLM_MAX_CONCURRENCY):
+    """Asks the LLM about distinct, uncached merchants and caches its answers; unanswered ones are left out."""
+    results = {}
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    if batches:
+        with metrics.span("llm"), ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches)))) as executor:
+            for answers in executor.map(lambda batch: classify_batch(llm, batch), batches):
+                for merchant, category in answers.items():
+                    if cache is not None:
+                        cache.set(merchant, category)
+                    results[merchant] = category
+
+    unanswered = _unanswered.get()
+    if unanswered is not None:
+        unanswered.extend(m for m in pending if m not in results)
+    return results
+
+def classify_merchants(merchants, llm, cache=None, batch_size=LLM_BATCH_SIZE, max_concurrency=LLM_MAX_CONCURRENCY):
+    """Classifies unknown merchants with batched, concurrent LLM prompts.
+
+    Duplicates are classified once and cached answers skip the LLM.
+    Merchants the LLM could not answer for come back as OTHERS and are
+    not cached, so they are retried on the next run.
+    """
+    results, pending = cached_categories(merchants, cache)
+    results.update(classify_uncached(pending, llm, cache, batch_size, max_concurrency))
+
+    # Map duplicates and unanswered merchants back onto the input names
+    by_key = {normalize_merchant(m): c for m, c in results.items()}
+    return {m: by_key.get(normalize_merchant(m), "OTHERS") for m in merchants}
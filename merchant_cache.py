@@ -0,0 +1,96 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import metrics
+
+MERCHANT_CACHE_PATH = os.getenv("MERCHANT_CACHE_PATH", "cache/merchant_categories.sqlite3")
+
+# How long LLM answers are trusted; "OTHERS" answers expire sooner
+MERCHANT_CACHE_TTL = int(os.getenv("MERCHANT_CACHE_TTL", str(30 * 24 * 3600)))
+MERCHANT_CACHE_NEGATIVE_TTL = int(os.getenv("MERCHANT_CACHE_NEGATIVE_TTL", str(7 * 24 * 3600)))
+
+NEGATIVE_CATEGORY = "OTHERS"
+
+def normalize_merchant(name):
+    """Uppercases a merchant name and collapses runs of whitespace."""
+    return re.sub(r'\s+', ' ', str(name)).strip().upper()
+
+class MerchantCache:
+    """Durable merchant -> category cache for LLM answers, stored in SQLite.
+
+    Safe to share between threads; separate processes can share the same
+    file because SQLite handles the locking.
+    """
+
+    def __init__(self, path=MERCHANT_CACHE_PATH, ttl=MERCHANT_CACHE_TTL, negative_ttl=MERCHANT_CACHE_NEGATIVE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS merchant_categories ("
+                "merchant TEXT PRIMARY KEY, category TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def get(self, merchant):
+        """Returns the cached category for merchant, or None on a miss or expired entry."""
+        key = normalize_merchant(merchant)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT category FROM merchant_categories WHERE merchant = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.cache_lookup("merchant", row is not None)
+        return row[0] if row else None
+
+    def set(self, merchant, category):
+        """Stores a category for merchant; OTHERS is kept for the shorter negative TTL."""
+        ttl = self.negative_ttl if category == NEGATIVE_CATEGORY else self.ttl
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO merchant_categories (merchant, category, expires_at) VALUES (?, ?, ?)",
+                (normalize_merchant(merchant), category, time.time() + ttl)
+            )
+
+    def labels(self):
+        """Returns every unexpired (merchant, category) pair, e.g. as training data."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT merchant, category FROM merchant_categories WHERE expires_at > ?", (time.time(),)
+            ).fetchall()
+
+    def purge_expired(self):
+        """Deletes expired entries and returns how many were removed."""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM merchant_categories WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+
+    def stats(self):
+        """Returns hit/miss counters for this process."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,165 @@
+"""Offline merchant classifier: TF-IDF character n-grams + logistic regression.
+
+Trained on merchant names labelled with the LLM's categories: the list in
+merchant_labels.csv plus the answers accumulated in the merchant cache.
+It is asked about merchants the rules and the cache do not know, before
+the remote LLM.
+
+    python merchant_classifier.py train      # fit and save the model
+    python merchant_classifier.py evaluate   # cross-validated precision and coverage per threshold
+"""
+import csv
+import hashlib
+import os
+import sys
+
+from llm_batch import CATEGORIES
+from merchant_cache import MerchantCache, normalize_merchant
+
+MERCHANT_CLASSIFIER_PATH = os.getenv("MERCHANT_CLASSIFIER_PATH", "models/merchant_classifier.joblib")
+
+# Labelled UPI merchant names (merchant,category) to train on
+MERCHANT_LABELS_PATH = os.getenv("MERCHANT_LABELS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                      "merchant_labels.csv"))
+
+# Predictions below this probability go to the LLM instead; see evaluate()
+MERCHANT_CLASSIFIER_THRESHOLD = float(os.getenv("MERCHANT_CLASSIFIER_THRESHOLD", "0.7"))
+
+# evaluate() suggests the lowest threshold whose answers are at least this precise
+TARGET_PRECISION = 0.95
+
+class MerchantClassifier:
+    def __init__(self, model=None, threshold=MERCHANT_CLASSIFIER_THRESHOLD, fingerprint="unsaved"):
+        self.model = model
+        self.threshold = threshold
+        # Hash of the saved model file, set by load()
+        self.fingerprint = fingerprint
+
+    @property
+    def version(self):
+        """Identifies the predictions this classifier makes, for cache keys: model file and threshold."""
+        return f"{self.fingerprint}@{self.threshold}"
+
+    @staticmethod
+    def build_model():
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline
+
+        return make_pipeline(
+            TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), sublinear_tf=True, lowercase=False),
+            # A weak prior (C=10) keeps confident predictions above the threshold; see evaluate()
+            LogisticRegression(max_iter=2000, class_weight="balanced", C=10)
+        )
+
+    def fit(self, merchants, categories):
+        self.model = self.build_model()
+        self.model.fit([normalize_merchant(m) for m in merchants], categories)
+        return self
+
+    def predict(self, merchants):
+        """Returns a (category, probability) pair for every merchant."""
+        if not len(merchants):
+            return []
+        probabilities = self.model.predict_proba([normalize_merchant(m) for m in merchants])
+        best = probabilities.argmax(axis=1)
+        return [(str(self.model.classes_[i]), float(p[i])) for i, p in zip(best, probabilities)]
+
+    def classify(self, merchants):
+        """Returns {merchant: category} for the merchants predicted above the threshold."""
+        return {m: category for m, (category, probability) in zip(merchants, self.predict(merchants))
+                if probability >= self.threshold}
+
+    def save(self, path=MERCHANT_CLASSIFIER_PATH):
+        import joblib
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump(self.model, path)
+
+    @classmethod
+    def load(cls, path=MERCHANT_CLASSIFIER_PATH, threshold=MERCHANT_CLASSIFIER_THRESHOLD):
+        import joblib
+
+        with open(path, "rb") as f:
+            fingerprint = hashlib.sha256(f.read()).hexdigest()[:12]
+        return cls(joblib.load(path), threshold, fingerprint)
+
+def load_classifier(path=MERCHANT_CLASSIFIER_PATH):
+    """Loads the saved classifier, or returns None if there is no usable model."""
+    if not os.path.exists(path):
+        return None
+    try:
+        return MerchantClassifier.load(path)
+    except Exception as e:
+        print(f"Could not load merchant classifier from {path}: {e}")
+        return None
+
+def load_labels(path=MERCHANT_LABELS_PATH):
+    """Returns {merchant: category} from a merchant,category CSV file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return {normalize_merchant(row["merchant"]): row["category"].strip().upper() for row in csv.DictReader(f)}
+
+def training_data(labels, cache=None):
+    """Returns (merchants, categories) from the labelled list and cached LLM answers.
+
+    Only the categories the LLM answers with are learnt; the list wins
+    over the cache where they disagree.
+    """
+    merged = {normalize_merchant(m): c for m, c in labels.items()}
+    if cache is not None:
+        for merchant, category in cache.labels():
+            merged.setdefault(merchant, category)
+    merged = {m: c for m, c in merged.items() if c in CATEGORIES}
+    return list(merged), list(merged.values())
+
+def threshold_table(predictions, truth, thresholds):
+    """[(threshold, precision, coverage)] of the predictions at or above each threshold."""
+    table = []
+    for threshold in thresholds:
+        confident = [(c, y) for (c, p), y in zip(predictions, truth) if p >= threshold]
+        precision = sum(c == y for c, y in confident) / len(confident) if confident else 1.0
+        table.append((threshold, precision, len(confident) / len(truth)))
+    return table
+
+def evaluate(merchants, categories, folds=5, thresholds=None):
+    """Cross-validated accuracy, and precision and LLM-free coverage per threshold.
+
+    Every merchant is predicted by a model that did not see it, so the
+    figures estimate how the saved model does on new merchants.
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    thresholds = thresholds or [t / 100 for t in range(30, 100, 5)]
+    predictions = [None] * len(merchants)
+    for train, test in StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(merchants, categories):
+        classifier = MerchantClassifier().fit([merchants[i] for i in train], [categories[i] for i in train])
+        for i, prediction in zip(test, classifier.predict([merchants[i] for i in test])):
+            predictions[i] = prediction
+
+    table = threshold_table(predictions, categories, thresholds)
+    precise = [threshold for threshold, precision, _ in table if precision >= TARGET_PRECISION]
+    return {
+        "samples": len(merchants),
+        "accuracy": sum(c == y for (c, _), y in zip(predictions, categories)) / len(categories),
+        "thresholds": table,
+        "suggested_threshold": precise[0] if precise else None
+    }
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "train"
+    merchants, categories = training_data(load_labels(), MerchantCache())
+
+    if command == "train":
+        MerchantClassifier().fit(merchants, categories).save()
+        print(f"Trained on {len(merchants)} merchants, saved to: {MERCHANT_CLASSIFIER_PATH}")
+    elif command == "evaluate":
+        report = evaluate(merchants, categories)
+        print(f"samples: {report['samples']}, accuracy: {report['accuracy']:.3f}")
+        print(f"{'threshold':>9} {'precision':>9} {'coverage':>8}")
+        for threshold, precision, coverage in report["thresholds"]:
+            print(f"{threshold:>9.2f} {precision:>9.3f} {coverage:>8.3f}")
+        print(f"Lowest threshold with precision >= {TARGET_PRECISION}: {report['suggested_threshold']} "
+              f"(MERCHANT_CLASSIFIER_THRESHOLD, now {MERCHANT_CLASSIFIER_THRESHOLD})")
+    else:
+        print("Usage: python merchant_classifier.py [train|evaluate]")
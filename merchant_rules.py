@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from keyword_matcher import KeywordMatcher
+
+# Merchant and keyword rules, checked before any model or LLM
+MERCHANT_RULES_PATH = os.getenv("MERCHANT_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                    "merchant_rules.json"))
+
+# How often running workers look at the file for changes, in seconds
+MERCHANT_RULES_CHECK_SECONDS = float(os.getenv("MERCHANT_RULES_CHECK_SECONDS", "5"))
+
+class MerchantRules:
+    """One loaded version of the rules: keyword -> category plus its compiled matcher.
+
+    Read-only once built, so a pipeline run can take one snapshot and use
+    it for both its cache keys and its categorization, whatever reloads
+    happen meanwhile.
+    """
+
+    def __init__(self, categories, label=""):
+        self.categories = MappingProxyType(dict(categories))
+        self.label = label
+        self.version = hashlib.sha256(json.dumps(dict(categories), sort_keys=True).encode()).hexdigest()[:12]
+
+        # Compile the keywords once so each narration is scanned in a single pass
+        self.matcher = KeywordMatcher(categories)
+
+    def __len__(self):
+        return len(self.categories)
+
+def parse_rules(document):
+    """Builds MerchantRules from the rules file's JSON: {"version": ..., "categories": {category: [keyword, ...]}}."""
+    categories = {}
+    for category, keywords in document["categories"].items():
+        for keyword in keywords:
+            keyword = keyword.strip().upper()
+            if keyword in categories:
+                raise ValueError(f"{keyword} is listed under both {categories[keyword]} and {category}")
+            categories[keyword] = category
+    return MerchantRules(categories, str(document.get("version", "")))
+
+def load_rules(path=MERCHANT_RULES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return parse_rules(json.load(f))
+
+class RuleStore:
+    """The current merchant rules, reloaded when the rules file changes.
+
+    current() checks the file at most every check_seconds; a changed file
+    is parsed and compiled by one thread and swapped in whole, while the
+    readers, which never take the lock, keep the rules they have. If the new
+    file is invalid, the previous rules stay in use.
+    """
+
+    def __init__(self, path=MERCHANT_RULES_PATH, check_seconds=MERCHANT_RULES_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._stamp = self._file_stamp()
+        self._rules = load_rules(path)
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def current(self):
+        """The rules to use for the next categorization."""
+        if time.monotonic() >= self._next_check:
+            self.reload()
+        return self._rules
+
+    def reload(self, force=False):
+        """Loads the file again if it changed (or if force); returns True when new rules were swapped in."""
+        # Only one thread checks the file; the others carry on with the current rules
+        if not self._lock.acquire(blocking=force):
+            return False
+        try:
+            self._next_check = time.monotonic() + self.check_seconds
+            try:
+                stamp = self._file_stamp()
+                if stamp == self._stamp and not force:
+                    return False
+                rules = load_rules(self.path)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                print(f"⚠️ Keeping merchant rules {self._rules.version}, could not load {self.path}: {e}")
+                return False
+
+            self._stamp = stamp
+            if rules.version == self._rules.version:
+                return False
+            previous, self._rules = self._rules, rules
+            print(f"✅ Merchant rules reloaded: {previous.version} -> {rules.version} ({rules.label}, {len(rules)} keywords)")
+            return True
+        finally:
+            self._lock.release()
+
+    @property
+    def version(self):
+        return self.current().version
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_rule_store():
+    """The rule store shared by every categorizer in this process, created on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RuleStore()
+        return _store
+
+def current_rules():
+    return get_rule_store().current()
+
+if __name__ == "__main__":
+    rules = load_rules()
+    print(f"{MERCHANT_RULES_PATH}: version {rules.label}, hash {rules.version}, {len(rules)} keywords")
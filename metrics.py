@@ -0,0 +1,206 @@
+"""Process-wide counters, latency histograms and per-stage timing spans.
+
+Metrics are rendered in the Prometheus text format for the backends'
+/metrics endpoint. A span times one stage of a statement: it feeds the
+stage latency histogram and, inside collect_timings(), the per-request
+timing breakdown.
+
+    with metrics.collect_timings() as timings:
+        with metrics.span("download"):
+            ...
+    timings  ->  {"download": 0.41}
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; statements take from milliseconds (cached) to minutes (large PDFs)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels) + "}"
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """A named metric with a fixed set of label names; one series per label combination."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+            # A metric without labels is reported from the start, as zero
+            if not series and not self.label_names:
+                series = [((), self.empty())]
+            for key, value in series:
+                labels = list(zip(self.label_names, key))
+                lines.extend(self._sample_lines(labels, value))
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def empty(self):
+        return 0
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def _sample_lines(self, labels, value):
+        return [f"{self.name}{format_labels(labels)} {format_value(value)}"]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        super().__init__(name, documentation, labels, registry)
+
+    def empty(self):
+        return {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = self.empty()
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def _sample_lines(self, labels, series):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, series["counts"]):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{format_labels(labels + [('le', format_value(float(bound)))])} {cumulative}")
+        lines.append(f"{self.name}_sum{format_labels(labels)} {format_value(series['sum'])}")
+        lines.append(f"{self.name}_count{format_labels(labels)} {series['count']}")
+        return lines
+
+class Registry:
+    """The metrics of this process, in registration order."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram("bank_analyzer_stage_seconds", "Time spent in each stage of processing a statement.",
+                          labels=("stage",))
+STAGE_ERRORS = Counter("bank_analyzer_stage_errors_total", "Stages that raised an exception.", labels=("stage",))
+REQUEST_SECONDS = Histogram("bank_analyzer_http_request_seconds", "HTTP request latency.",
+                            labels=("endpoint", "method", "status"))
+ROWS_PROCESSED = Counter("bank_analyzer_rows_processed_total", "Transactions produced by a stage.", labels=("stage",))
+LLM_CALLS = Counter("bank_analyzer_llm_calls_total", "LLM prompts sent, by outcome (ok, error, invalid).", labels=("outcome",))
+CACHE_REQUESTS = Counter("bank_analyzer_cache_requests_total", "Cache lookups, by cache and result.",
+                         labels=("cache", "result"))
+DOWNLOADED_BYTES = Counter("bank_analyzer_downloaded_bytes_total", "Bytes of statement PDFs downloaded.")
+UPLOADED_BYTES = Counter("bank_analyzer_uploaded_bytes_total", "Bytes of chart images uploaded.")
+
+_timings = contextvars.ContextVar("timings", default=None)
+
+@contextmanager
+def collect_timings():
+    """Collects {stage: seconds} for the spans run inside the block (in this thread)."""
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+@contextmanager
+def span(stage):
+    """Times a stage into the latency histogram and the current timing breakdown, if any."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+def cache_lookup(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+def rounded(timings):
+    """A timing breakdown rounded to milliseconds, for JSON responses."""
+    return {stage: round(seconds, 3) for stage, seconds in timings.items()}
+
+def instrument(app):
+    """Times every request of a Flask app and serves the metrics at /metrics."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            # The route pattern, not the path, so job and customer IDs do not become series
+            endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                    endpoint=endpoint, method=request.method, status=response.status_code)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def serve_metrics():
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+    return app
@@ -0,0 +1,129 @@
+"""Structured parsing of bank statement narrations.
+
+A narration is matched once, against the one pattern its prefix calls
+for ("UPI-", "NEFT CR-", "IMPS-", ...), and turned into a record:
+
+    transaction_type  UPI, NEFT, ACH, RTGS, IMPS, CHQ, GST or FT
+    counterparty      merchant / remitter / beneficiary name
+    reference         the bank's reference or cheque number
+    direction         "credit" or "debit" where the narration says so
+    details           the raw regex groups
+
+Narrations with no known prefix, or whose prefix pattern does not match,
+fall back to trying every pattern in order, as before.
+"""
+import re
+
+import pandas as pd
+
+# Transaction type -> compiled pattern, in fallback order
+TRANSACTION_PATTERNS = {
+    "UPI": re.compile(r'UPI-([\w\s&]+?)-', re.IGNORECASE),
+    "NEFT": re.compile(r'NEFT\s+(CR|DR)-([A-Z0-9]+)-([\w\s\.]+)-([\w\s\.]+)-([A-Z0-9\s]+)', re.IGNORECASE),
+    "ACH": re.compile(r'ACH\s+(D|C)-([\w\s\.]+)-([\w\s\.]+)', re.IGNORECASE),
+    "RTGS": re.compile(r'RTGS\s+(CR|DR)-([A-Z0-9]+)-([\w\s\.]+)-([\w\s\.]+)-([A-Z0-9\s]+)', re.IGNORECASE),
+    "IMPS": re.compile(r'IMPS-([A-Z0-9]+)-([\w\s\.]+)-([\w\s\.]+)-([A-Z0-9\s]+)', re.IGNORECASE),
+    "CHQ": re.compile(r'CHQ\s+DEP\s+MICR\s+CLG\s+([\w\s\.]+)-MICR\s+(\d+)\s+CLG\s+-\s+NO\s+:\s+([\w\s\.]+)', re.IGNORECASE),
+    "GST": re.compile(r'GST/BANK\s+REFERENCE\s+NO:\s+([A-Z0-9]+)/CI\s+N\s+NO:\s+([A-Z0-9]+)', re.IGNORECASE),
+    "FT": re.compile(r'FT-([\w\s\.]+)-([A-Z0-9]+)-([\w\s\.]+)', re.IGNORECASE)
+}
+
+# The leading token that picks a narration's pattern
+PREFIX_PATTERN = re.compile(r'\s*(UPI|NEFT|ACH|RTGS|IMPS|CHQ|GST|FT)\b', re.IGNORECASE)
+
+# Type -> (counterparty group, reference group, direction group or fixed direction)
+FIELD_GROUPS = {
+    "UPI": (0, None, None),
+    "NEFT": (2, 4, 0),
+    "ACH": (1, 2, 0),
+    "RTGS": (2, 4, 0),
+    "IMPS": (1, 0, None),
+    "CHQ": (0, 2, "credit"),
+    "GST": (None, 0, "debit"),
+    "FT": (2, 1, 0)
+}
+
+DIRECTIONS = {"CR": "credit", "C": "credit", "DR": "debit", "D": "debit"}
+
+FIELDS = ["transaction_type", "counterparty", "reference", "direction"]
+
+def _strip(value):
+    return value.strip() if value is not None else None
+
+def _record(transaction_type, groups):
+    counterparty, reference, direction = FIELD_GROUPS[transaction_type]
+    if isinstance(direction, int):
+        direction = DIRECTIONS.get(groups[direction].upper())
+    return {
+        "transaction_type": transaction_type,
+        "counterparty": _strip(groups[counterparty]) if counterparty is not None else None,
+        "reference": _strip(groups[reference]) if reference is not None else None,
+        "direction": direction,
+        "details": groups
+    }
+
+def parse_narration(narration):
+    """Parses one narration into a record dict, or None when no pattern matches."""
+    if not isinstance(narration, str):
+        return None
+
+    prefix = PREFIX_PATTERN.match(narration)
+    if prefix:
+        transaction_type = prefix.group(1).upper()
+        match = TRANSACTION_PATTERNS[transaction_type].search(narration)
+        if match:
+            return _record(transaction_type, match.groups())
+
+    for transaction_type, pattern in TRANSACTION_PATTERNS.items():
+        match = pattern.search(narration)
+        if match:
+            return _record(transaction_type, match.groups())
+    return None
+
+def _fill(records, rows, transaction_type, groups):
+    """Writes the fields of matched rows (groups from Series.str.extract) into records."""
+    counterparty, reference, direction = FIELD_GROUPS[transaction_type]
+    records.loc[rows, "transaction_type"] = transaction_type
+    if counterparty is not None:
+        records.loc[rows, "counterparty"] = groups.loc[rows, counterparty].str.strip()
+    if reference is not None:
+        records.loc[rows, "reference"] = groups.loc[rows, reference].str.strip()
+    if isinstance(direction, int):
+        records.loc[rows, "direction"] = groups.loc[rows, direction].str.upper().map(DIRECTIONS)
+    elif direction is not None:
+        records.loc[rows, "direction"] = direction
+
+def parse_narrations(narrations):
+    """Parses a column of narrations; returns a DataFrame of FIELDS aligned with it.
+
+    Same result as parse_narration per row. Each distinct narration is
+    parsed once, and each pattern runs as one Series.str.extract over the
+    narrations it applies to.
+    """
+    codes, unique = pd.factorize(narrations.astype(object).where(narrations.notna(), '').map(str))
+    unique = pd.Series(unique, dtype=object)
+    records = pd.DataFrame(None, index=unique.index, columns=FIELDS, dtype=object)
+
+    prefixes = unique.str.extract(PREFIX_PATTERN)[0].str.upper()
+    pending = pd.Series(True, index=unique.index)
+    for transaction_type, pattern in TRANSACTION_PATTERNS.items():
+        candidates = unique[prefixes == transaction_type]
+        if candidates.empty:
+            continue
+        groups = candidates.str.extract(pattern)
+        # Every group of these patterns is mandatory, so the first one tells whether it matched
+        rows = groups.index[groups[0].notna()]
+        _fill(records, rows, transaction_type, groups)
+        pending[rows] = False
+
+    for transaction_type, pattern in TRANSACTION_PATTERNS.items():
+        if not pending.any():
+            break
+        groups = unique[pending].str.extract(pattern)
+        rows = groups.index[groups[0].notna()]
+        _fill(records, rows, transaction_type, groups)
+        pending[rows] = False
+
+    parsed = records.take(codes) if len(codes) else records.iloc[:0]
+    parsed.index = narrations.index
+    return parsed
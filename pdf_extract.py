@@ -0,0 +1,240 @@
+"""Local PDF table extraction, an alternative to the ConvertAPI round-trip.
+
+Reads statement PDFs with pdfplumber and returns the transaction table
+page by page, in the same raw shape as the converted XLSX sheets, so
+3-clean_data.py can merge continuation lines as usual. Pages without a
+text layer are OCRed with Tesseract. Long statements are parsed in page
+ranges across a process pool and stitched back in page order.
+"""
+import io
+import multiprocessing
+import os
+import re
+import statistics
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# Header words that start each statement column, mapped to the column name
+HEADER_KEYWORDS = {
+    "DATE": "Date",
+    "NARRATION": "Narration",
+    "CHQ": "Chq./Ref.No.",
+    "VALUE": "Value Dt",
+    "WITHDRAWAL": "Withdrawal Amt.",
+    "DEPOSIT": "Deposit Amt.",
+    "CLOSING": "Closing Balance"
+}
+AMOUNT_COLUMNS = {"Withdrawal Amt.", "Deposit Amt.", "Closing Balance"}
+
+DATE_PATTERN = re.compile(r'^\d{1,2}[/-]\d{1,2}[/-]\d{2,4}$')
+AMOUNT_PATTERN = re.compile(r'^-?[\d,]+\.\d{2}(Cr|Dr)?$', re.IGNORECASE)
+
+# Lines that end the transaction table on a page
+STOP_PATTERN = re.compile(r'STATEMENT SUMMARY|PAGE NO|PAGE \d+ OF \d+|GENERATED ON', re.IGNORECASE)
+
+OCR_RESOLUTION = 300
+
+# Page-parallel parsing: worker processes (0 = one per core), pages per task,
+# and the smallest statement worth fanning out
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0"))
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+MIN_PARALLEL_PAGES = int(os.getenv("PDF_MIN_PARALLEL_PAGES", "16"))
+
+_executor = None
+_executor_workers = None
+_executor_lock = threading.Lock()
+
+def group_lines(words, tolerance=3):
+    """Groups words into lines by their vertical position, top to bottom."""
+    lines = []
+    for word in sorted(words, key=lambda w: (w["top"], w["x0"])):
+        if lines and abs(word["top"] - lines[-1][0]["top"]) <= tolerance:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    return [sorted(line, key=lambda w: w["x0"]) for line in lines]
+
+def find_header(lines):
+    """Returns (line index, [(column name, x0, x1)]) of the table header, or (None, None)."""
+    for index, line in enumerate(lines):
+        texts = [w["text"].upper() for w in line]
+        if not any(t.startswith("DATE") for t in texts) or not any(t.startswith("NARRATION") for t in texts):
+            continue
+
+        columns = []
+        for word, text in zip(line, texts):
+            keyword = next((k for k in HEADER_KEYWORDS if text.startswith(k)), None)
+            # "Value Dt" must not be mistaken for a second Date column
+            if keyword and not (keyword == "DATE" and columns and columns[-1][0] == "Value Dt"):
+                columns.append([HEADER_KEYWORDS[keyword], word["x0"], word["x1"]])
+            elif columns:
+                columns[-1][2] = word["x1"]
+        return index, [tuple(c) for c in columns]
+    return None, None
+
+def assign_columns(line, columns):
+    """Places each word of a line under its column; returns one raw row."""
+    cells = [[] for _ in columns]
+    amount_columns = [i for i, c in enumerate(columns) if c[0] in AMOUNT_COLUMNS]
+    for word in line:
+        if amount_columns and AMOUNT_PATTERN.match(word["text"]):
+            # Amounts are right-aligned under their header
+            target = min(amount_columns, key=lambda i: abs(columns[i][2] - word["x1"]))
+        else:
+            target = 0
+            for i, (_, x0, _) in enumerate(columns):
+                if word["x0"] >= x0 - 2:
+                    target = i
+        cells[target].append(word["text"])
+    return [" ".join(c) if c else None for c in cells]
+
+def table_rows(lines, columns, start):
+    """Returns the raw table rows below the header, stopping at the page footer."""
+    rows = []
+    date_index = [c[0] for c in columns].index("Date")
+    heights = [line[0]["bottom"] - line[0]["top"] for line in lines[start:] if line]
+    max_gap = 2.5 * (statistics.median(heights) if heights else 10)
+
+    previous_top = None
+    for line in lines[start:]:
+        text = " ".join(w["text"] for w in line)
+        if STOP_PATTERN.search(text):
+            break
+        row = assign_columns(line, columns)
+        starts_transaction = row[date_index] is not None and DATE_PATTERN.match(row[date_index].split()[0])
+        # A detached undated line after a gap is page furniture, not a narration
+        if not starts_transaction and previous_top is not None and line[0]["top"] - previous_top > max_gap:
+            break
+        rows.append(row)
+        previous_top = line[0]["top"]
+    return rows
+
+def ocr_words(page, resolution=OCR_RESOLUTION):
+    """OCRs a page without a text layer and returns words in PDF coordinates."""
+    import pytesseract
+
+    image = page.to_image(resolution=resolution).original
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    scale = 72 / resolution
+    words = []
+    for text, left, top, width, height, conf in zip(data["text"], data["left"], data["top"],
+                                                     data["width"], data["height"], data["conf"]):
+        if text.strip() and float(conf) >= 0:
+            words.append({
+                "text": text.strip(),
+                "x0": left * scale, "x1": (left + width) * scale,
+                "top": top * scale, "bottom": (top + height) * scale
+            })
+    return words
+
+def page_words(page):
+    """Returns the page's words, falling back to OCR when it has no text layer."""
+    words = page.extract_words(keep_blank_chars=False, use_text_flow=False)
+    return words if words else ocr_words(page)
+
+def extract_page_rows(page, columns=None):
+    """Returns (columns, raw rows) for one page; columns carry over from earlier pages."""
+    lines = group_lines(page_words(page))
+    header_index, header_columns = find_header(lines)
+    if header_columns:
+        columns, start = header_columns, header_index + 1
+    elif columns:
+        start = 0
+    else:
+        return None, []
+    return columns, table_rows(lines, columns, start)
+
+def extract_pages(pdf, pages=None, columns=None):
+    """Yields (columns, raw rows) for each page of an open pdfplumber document."""
+    for page in (pdf.pages if pages is None else [pdf.pages[i] for i in pages]):
+        columns, rows = extract_page_rows(page, columns)
+        yield columns, rows
+
+def open_pdf(pdf_source, password=""):
+    import pdfplumber
+
+    if isinstance(pdf_source, (bytes, bytearray)):
+        pdf_source = io.BytesIO(pdf_source)
+    return pdfplumber.open(pdf_source, password=password or None)
+
+def normalize_source(pdf_source):
+    """A path string or bytes for any PDF source, so it can be opened more than once and sent to workers."""
+    if isinstance(pdf_source, (str, bytes, bytearray)):
+        return pdf_source
+    if isinstance(pdf_source, os.PathLike):
+        return os.fspath(pdf_source)
+    # A file object: read all of it, wherever its position was
+    if hasattr(pdf_source, "seek"):
+        pdf_source.seek(0)
+    return pdf_source.read()
+
+def extract_page_range(pdf_source, password, pages, columns):
+    """Worker task: extracts a range of pages, starting from the given header columns."""
+    with open_pdf(pdf_source, password) as pdf:
+        return list(extract_pages(pdf, pages, columns))
+
+def get_executor(workers):
+    """Returns the shared page-parsing process pool, creating it on first use."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            # Spawned, not forked: the backend forks from a threaded process
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _executor_workers = workers
+        return _executor
+
+def extract_page_results(pdf_source, password="", workers=None):
+    """Returns (columns, raw rows) for every page, in page order.
+
+    Long statements are split into page ranges and parsed in a process
+    pool sized to the available cores.
+    """
+    workers = workers or PDF_WORKERS or os.cpu_count() or 1
+    pdf_source = normalize_source(pdf_source)
+    with open_pdf(pdf_source, password) as pdf:
+        page_count = len(pdf.pages)
+        if workers <= 1 or page_count < MIN_PARALLEL_PAGES:
+            return list(extract_pages(pdf))
+
+        # Header columns from the first page that has them, for ranges starting on a headerless page
+        columns = None
+        for page in pdf.pages:
+            columns, _ = extract_page_rows(page)
+            if columns:
+                break
+
+    size = max(1, min(PAGES_PER_TASK, -(-page_count // workers)))
+    ranges = [range(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+    executor = get_executor(workers)
+    futures = [executor.submit(extract_page_range, pdf_source, password, pages, columns) for pages in ranges]
+    return [result for future in futures for result in future.result()]
+
+def extract_sheets(pdf_source, password="", workers=None):
+    """Extracts the transaction table into one raw DataFrame per page.
+
+    The result has the same shape as pd.read_excel(..., sheet_name=None,
+    header=None) on a converted statement: the first "sheet" starts with
+    the header row, so it can go straight into clean_sheets, which also
+    merges narrations continuing across a page break.
+    """
+    sheets = {}
+    column_names = None
+    for number, (columns, rows) in enumerate(extract_page_results(pdf_source, password, workers), start=1):
+        if columns is None:
+            continue
+        names = [c[0] for c in columns]
+        if column_names is None:
+            column_names = names
+            rows = [column_names] + rows
+        elif names != column_names:
+            # Keep every page in the first page's column order
+            rows = [[dict(zip(names, row)).get(c) for c in column_names] for row in rows]
+        sheets[f"Page {number}"] = pd.DataFrame(rows, columns=range(len(column_names)))
+
+    if not sheets:
+        raise ValueError("Could not find a transaction table in the PDF!")
+    return sheets
@@ -0,0 +1,232 @@
+import importlib
+import os
+import sys
+import threading
+from workspace import JobWorkspace
+import hashlib
+from result_cache import statement_key, file_sha256
+from stage_cache import StageCache, NoStageCache
+from statement_store import write_statement, export_csv
+from aggregates import aggregate_statement
+from llm_batch import track_unanswered
+from merchant_rules import current_rules
+import metrics
+
+# The stage scripts have numeric prefixes, so they are loaded by name
+convert_stage = importlib.import_module("2-convert_pdf_to_excel")
+clean_stage = importlib.import_module("3-clean_data")
+categorize_stage = importlib.import_module("4-categorize_transactions")
+summary_stage = importlib.import_module("5-financial_summary")
+graphs_stage = importlib.import_module("6-generate_graphs")
+
+# Bump when a stage changes its output, so cached results are not reused
+PIPELINE_VERSION = "2"
+
+# Write intermediate files (XLSX, Parquet tables, summary text) for debugging
+PERSIST_INTERMEDIATES = os.getenv("PIPELINE_PERSIST", "0") == "1"
+
+# Also export the persisted tables as CSV
+EXPORT_CSV = os.getenv("PIPELINE_EXPORT_CSV", "0") == "1"
+
+# Reuse unchanged stage outputs across runs; STAGE_CACHE=0 always recomputes
+STAGE_CACHE_ENABLED = os.getenv("STAGE_CACHE", "1") == "1"
+
+_categorizer = None
+_categorizer_lock = threading.Lock()
+
+def convert(pdf_source, password="", output_folder=None, engine=None):
+    """Converts a PDF statement (path or bytes) into a dict of raw sheet DataFrames."""
+    return convert_stage.convert_pdf(pdf_source, password, output_folder=output_folder, engine=engine)
+
+def clean(all_sheets):
+    """Merges the raw sheets into one cleaned transactions DataFrame."""
+    return clean_stage.clean_sheets(all_sheets)
+
+def get_categorizer():
+    """The categorizer shared by every request in this process, created on first use."""
+    global _categorizer
+    with _categorizer_lock:
+        if _categorizer is None:
+            _categorizer = categorize_stage.UPITransactionCategorizer()
+        return _categorizer
+
+def categorize(df, categorizer=None, rules=None):
+    """Returns the cleaned transactions with a Category column."""
+    return categorize_stage.categorize_transactions(df, categorizer or get_categorizer(), rules)
+
+def aggregate(df):
+    """Monthly and per-category figures, computed once for both the summary and the graphs."""
+    return aggregate_statement(df)
+
+def summarize(df, aggregates=None):
+    """Returns the financial summary text for categorized transactions."""
+    return summary_stage.financial_summary(df, aggregates)
+
+def render_graphs(df, aggregates=None):
+    """Draws the graphs in memory and returns {name: (file name, PNG bytes)}."""
+    return graphs_stage.render_graphs(df, aggregates)
+
+def timed(stage, func, *args, **kwargs):
+    """Runs one stage inside a metrics span."""
+    with metrics.span(stage):
+        return func(*args, **kwargs)
+
+def rules_version():
+    """Version of the categorization rules the pipeline currently uses."""
+    return categorize_stage.rules_version()
+
+def pdf_sha256(pdf_source):
+    """SHA-256 of a PDF given as a path or as bytes."""
+    if isinstance(pdf_source, (bytes, bytearray)):
+        return hashlib.sha256(pdf_source).hexdigest()
+    return file_sha256(pdf_source)
+
+def statement_cache_key(pdf_digest, password="", rules=None, categorizer=None):
+    """Content address of a statement for the result cache, from the PDF's SHA-256.
+
+    Pass the MerchantRules snapshot and categorizer the statement will be
+    run with, so the key matches the rules and classifier model that
+    produced the result.
+    """
+    version = rules.version if rules is not None else rules_version()
+    model_version = (categorizer or get_categorizer()).classifier_version
+    return statement_key(pdf_digest, password, PIPELINE_VERSION, version, model_version)
+
+def stage_versions(rules=None, categorizer=None):
+    """Code/config version of each stage; a change reruns that stage and the ones after it.
+
+    Categorize also depends on the rules and on the offline classifier model.
+    """
+    version = rules.version if rules is not None else rules_version()
+    model_version = (categorizer or get_categorizer()).classifier_version
+    return {
+        "convert": convert_stage.STAGE_VERSION,
+        "clean": clean_stage.STAGE_VERSION,
+        "categorize": f"{categorize_stage.STAGE_VERSION}-{version}-{model_version}",
+        "summarize": summary_stage.STAGE_VERSION,
+        "graphs": graphs_stage.STAGE_VERSION
+    }
+
+def persist_statement(df, workspace, name):
+    """Writes a stage's table into the workspace as Parquet, plus CSV when exporting."""
+    write_statement(df, workspace.output_path(name + ".parquet"))
+    if EXPORT_CSV:
+        export_csv(df, workspace.output_path(name + ".csv"))
+
+def run_pipeline(pdf_source, password="", workspace=None, persist=None, categorizer=None, stage_cache=None,
+                 pdf_digest=None, rules=None):
+    """Runs every stage in-process inside a job workspace.
+
+    Each stage is memoized on its version and a fingerprint of its input,
+    so after a rules change only categorize, summarize and graphs rerun.
+    The PDF can be a path or bytes already in memory; pass its SHA-256 as
+    pdf_digest when it is known, so it is not hashed again. The whole run
+    uses one MerchantRules snapshot (rules, or the current one), so a
+    reload mid-run cannot store new-rules output under the old version.
+    Returns the summary, graph images (and paths, when persisted),
+    transactions, how many merchants the LLM failed to categorize (the
+    result should not be cached when there are any) and which stages
+    were reused. When no workspace is given a new one is created; the caller
+    owns it and should clean it up.
+    """
+    if persist is None:
+        persist = PERSIST_INTERMEDIATES
+    if workspace is None:
+        workspace = JobWorkspace(keep=True)
+    if stage_cache is None:
+        stage_cache = StageCache() if STAGE_CACHE_ENABLED else NoStageCache()
+
+    if rules is None:
+        rules = current_rules()
+
+    workspace.create()
+    output_folder = workspace.output_folder
+    versions = stage_versions(rules, categorizer)
+    reused = {}
+
+    engine = convert_stage.PDF_ENGINE
+    pdf_fingerprint = f"{pdf_digest or pdf_sha256(pdf_source)}:{password or ''}:{engine}"
+    all_sheets, sheets_fingerprint, reused["convert"] = stage_cache.run(
+        "convert", versions["convert"], pdf_fingerprint,
+        lambda: timed("convert", convert, pdf_source, password,
+                      output_folder=output_folder if persist else None, engine=engine)
+    )
+
+    cleaned_df, cleaned_fingerprint, reused["clean"] = stage_cache.run(
+        "clean", versions["clean"], sheets_fingerprint, lambda: timed("clean", clean, all_sheets)
+    )
+    if cleaned_df.empty:
+        raise ValueError("No valid data found in any sheet!")
+    if not reused["clean"]:
+        metrics.ROWS_PROCESSED.inc(len(cleaned_df), stage="clean")
+    if persist:
+        persist_statement(cleaned_df, workspace, "cleaned_bank_statement")
+
+    # Merchants the LLM failed on fell back to OTHERS; such a result is not cached
+    with track_unanswered() as unanswered:
+        categorized_df, categorized_fingerprint, reused["categorize"] = stage_cache.run(
+            "categorize", versions["categorize"], cleaned_fingerprint,
+            lambda: timed("categorize", categorize, cleaned_df, categorizer, rules),
+            cacheable=lambda: not unanswered
+        )
+    if unanswered:
+        print(f"⚠️ {len(unanswered)} merchant(s) left as OTHERS after LLM errors; not caching this statement")
+    if not reused["categorize"]:
+        metrics.ROWS_PROCESSED.inc(len(categorized_df), stage="categorize")
+    if persist:
+        persist_statement(categorized_df, workspace, "categorized_bank_statement")
+
+    # Aggregated at most once, and only if the summary or graphs are not memoized
+    aggregates = []
+    def statement_aggregates():
+        if not aggregates:
+            aggregates.append(timed("aggregate", aggregate, categorized_df))
+        return aggregates[0]
+
+    summary_text, _, reused["summarize"] = stage_cache.run(
+        "summarize", versions["summarize"], categorized_fingerprint,
+        lambda: timed("summarize", summarize, categorized_df, statement_aggregates())
+    )
+    if persist:
+        with open(workspace.output_path("financial_summary.txt"), "w") as f:
+            f.write(summary_text)
+
+    images, _, reused["graphs"] = stage_cache.run(
+        "graphs", versions["graphs"], categorized_fingerprint,
+        lambda: timed("graphs", render_graphs, categorized_df, statement_aggregates())
+    )
+    graph_paths = {}
+    if persist:
+        for name, (filename, data) in images.items():
+            graph_paths[name] = workspace.output_path(filename)
+            with open(graph_paths[name], "wb") as f:
+                f.write(data)
+
+    return {
+        "job_id": workspace.job_id,
+        "workspace": workspace,
+        "summary_text": summary_text,
+        "graph_paths": graph_paths,
+        "graph_images": images,
+        "transactions": categorized_df,
+        "unanswered_merchants": len(unanswered),
+        "rules_version": rules.version,
+        "reused_stages": [stage for stage, hit in reused.items() if hit]
+    }
+
+if __name__ == "__main__":
+    # Reprocess an archive of statements, e.g. after a rules change:
+    #   python pipeline.py statements/*.pdf
+    if len(sys.argv) < 2:
+        print("Usage: python pipeline.py <statement.pdf> [...]")
+        sys.exit(1)
+
+    for pdf_path in sys.argv[1:]:
+        with JobWorkspace() as workspace:
+            try:
+                result = run_pipeline(pdf_path, workspace=workspace)
+            except Exception as e:
+                print(f"❌ {pdf_path}: {e}")
+                continue
+            reused = ", ".join(result["reused_stages"]) or "none"
+            print(f"✅ {pdf_path}: {len(result['transactions'])} transactions (reused: {reused})")
@@ -0,0 +1,262 @@
+"""Per-customer portfolio of statements, kept as monthly rollups.
+
+Each categorized statement a customer adds is folded into additive
+(account, month, category) rollups: income, expenses, balance sum/min/max
+and row counts. Transactions are fingerprinted, so a statement that
+overlaps one already added (e.g. two exports covering the same month)
+only contributes its new transactions. Portfolio summaries across
+accounts and months are answered from the rollups alone.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+from aggregates import aggregate_statement
+from statement_store import parse_amounts
+
+PORTFOLIO_PATH = os.getenv("PORTFOLIO_PATH", "data/portfolio.sqlite3")
+
+# Columns that identify a transaction, when present
+FINGERPRINT_COLUMNS = ['Date', 'Narration', 'Chq./Ref.No.', 'Withdrawal Amt.', 'Deposit Amt.', 'Closing Balance']
+
+def transaction_fingerprints(df):
+    """64-bit fingerprint per transaction.
+
+    Identical rows within a statement are numbered, so genuine repeats
+    (two equal payments on one day) stay distinct while the same pair in
+    an overlapping statement still matches.
+    """
+    key = pd.DataFrame(index=df.index)
+    for column in FINGERPRINT_COLUMNS:
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if column == 'Date':
+            key[column] = pd.to_datetime(values, errors='coerce').astype('datetime64[ns]').astype('int64')
+        elif column in ('Withdrawal Amt.', 'Deposit Amt.', 'Closing Balance'):
+            key[column] = parse_amounts(values).fillna(0).round(2)
+        else:
+            key[column] = values.astype(object).where(values.notna(), '').map(str).str.strip()
+    key['occurrence'] = key.groupby(list(key.columns), sort=False).cumcount()
+    return pd.util.hash_pandas_object(key, index=False).to_numpy().view('int64')
+
+class PortfolioStore:
+    """SQLite store of customers' statements, transaction fingerprints and monthly rollups."""
+
+    def __init__(self, path=PORTFOLIO_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS statements ("
+                "customer_id TEXT NOT NULL, account_id TEXT NOT NULL, statement_id TEXT NOT NULL, "
+                "first_date TEXT, last_date TEXT, transactions INTEGER NOT NULL, "
+                "new_transactions INTEGER NOT NULL, added_at REAL NOT NULL, "
+                "PRIMARY KEY (customer_id, account_id, statement_id))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS transactions_seen ("
+                "customer_id TEXT NOT NULL, account_id TEXT NOT NULL, fingerprint INTEGER NOT NULL, "
+                "date TEXT NOT NULL, PRIMARY KEY (customer_id, account_id, fingerprint))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS transactions_seen_date "
+                "ON transactions_seen (customer_id, account_id, date)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rollups ("
+                "customer_id TEXT NOT NULL, account_id TEXT NOT NULL, month TEXT NOT NULL, category TEXT NOT NULL, "
+                "deposits REAL NOT NULL, withdrawals REAL NOT NULL, expenses REAL NOT NULL, "
+                "expense_rows INTEGER NOT NULL, balance_sum REAL NOT NULL, balance_min REAL, balance_max REAL, "
+                "rows INTEGER NOT NULL, PRIMARY KEY (customer_id, account_id, month, category))"
+            )
+
+    def has_statement(self, customer_id, account_id, statement_id):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM statements WHERE customer_id = ? AND account_id = ? AND statement_id = ?",
+                (customer_id, account_id, statement_id)
+            ).fetchone() is not None
+
+    def add_statement(self, customer_id, account_id, transactions, statement_id=None):
+        """Folds a categorized statement into the customer's rollups.
+
+        Transactions already added from an overlapping statement of the same
+        account are skipped, as are rows without a date. Adding the same
+        statement_id twice is a no-op. Returns what was added.
+        """
+        df = transactions.reset_index(drop=True)
+        dates = pd.to_datetime(df['Date'], errors='coerce')
+        df = df[dates.notna()].reset_index(drop=True)
+        dates = dates[dates.notna()].reset_index(drop=True)
+
+        fingerprints = transaction_fingerprints(df)
+        if statement_id is None:
+            statement_id = hashlib.sha256(fingerprints.tobytes()).hexdigest()
+        day_text = dates.dt.strftime('%Y-%m-%d')
+        first_date = day_text.min() if len(df) else None
+        last_date = day_text.max() if len(df) else None
+
+        with self._lock, self._conn:
+            if self._conn.execute(
+                "SELECT 1 FROM statements WHERE customer_id = ? AND account_id = ? AND statement_id = ?",
+                (customer_id, account_id, statement_id)
+            ).fetchone():
+                return {"statement_id": statement_id, "already_added": True, "transactions": len(df),
+                        "new_transactions": 0, "first_date": first_date, "last_date": last_date}
+
+            # Only fingerprints inside this statement's date range can overlap
+            seen = set()
+            if len(df):
+                seen = {row[0] for row in self._conn.execute(
+                    "SELECT fingerprint FROM transactions_seen "
+                    "WHERE customer_id = ? AND account_id = ? AND date BETWEEN ? AND ?",
+                    (customer_id, account_id, first_date, last_date)
+                )}
+            new = ~pd.Series(fingerprints).isin(seen).to_numpy()
+
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO transactions_seen (customer_id, account_id, fingerprint, date) VALUES (?, ?, ?, ?)",
+                ((customer_id, account_id, int(f), d) for f, d in zip(fingerprints[new], day_text[new]))
+            )
+            self._conn.executemany(
+                "INSERT INTO rollups (customer_id, account_id, month, category, deposits, withdrawals, expenses, "
+                "expense_rows, balance_sum, balance_min, balance_max, rows) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (customer_id, account_id, month, category) DO UPDATE SET "
+                "deposits = deposits + excluded.deposits, withdrawals = withdrawals + excluded.withdrawals, "
+                "expenses = expenses + excluded.expenses, expense_rows = expense_rows + excluded.expense_rows, "
+                "balance_sum = balance_sum + excluded.balance_sum, "
+                "balance_min = MIN(balance_min, excluded.balance_min), "
+                "balance_max = MAX(balance_max, excluded.balance_max), rows = rows + excluded.rows",
+                ((customer_id, account_id) + row for row in self._rollup_rows(df[new]))
+            )
+            self._conn.execute(
+                "INSERT INTO statements (customer_id, account_id, statement_id, first_date, last_date, "
+                "transactions, new_transactions, added_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (customer_id, account_id, statement_id, first_date, last_date, len(df), int(new.sum()), time.time())
+            )
+
+        return {"statement_id": statement_id, "already_added": False, "transactions": len(df),
+                "new_transactions": int(new.sum()), "first_date": first_date, "last_date": last_date}
+
+    def _rollup_rows(self, df):
+        """(month, category, metrics...) rows for new transactions, from the shared aggregation."""
+        if df.empty:
+            return []
+        # Uncategorized rows are kept under an empty category
+        categories = df['Category'].astype(object) if 'Category' in df.columns else pd.Series(None, index=df.index)
+        df = df.assign(Category=categories.fillna('').map(str))
+        groups = aggregate_statement(df).groups
+
+        # Balance extremes are not additive sums, so they are grouped separately
+        if 'Closing Balance' in df.columns:
+            balance = parse_amounts(df['Closing Balance']).fillna(0)
+        else:
+            balance = pd.Series(0.0, index=df.index)
+        months = pd.to_datetime(df['Date']).dt.to_period('M')
+        extremes = balance.groupby([months, df['Category']]).agg(['min', 'max'])
+
+        rows = []
+        for (month, category), metrics in groups.iterrows():
+            low, high = extremes.loc[(month, category)]
+            rows.append((str(month), category,
+                         float(metrics['deposits']), float(metrics['withdrawals']), float(metrics['expenses']),
+                         int(metrics['expense_rows']), float(metrics['balance']), float(low), float(high),
+                         int(metrics['rows'])))
+        return rows
+
+    def rollups(self, customer_id, start_month=None, end_month=None, accounts=None):
+        """The customer's rollup rows (one per account, month and category) as a DataFrame."""
+        query = "SELECT * FROM rollups WHERE customer_id = ?"
+        params = [customer_id]
+        if start_month:
+            query += " AND month >= ?"
+            params.append(start_month)
+        if end_month:
+            query += " AND month <= ?"
+            params.append(end_month)
+        if accounts:
+            query += f" AND account_id IN ({', '.join('?' for _ in accounts)})"
+            params.extend(accounts)
+
+        with self._lock:
+            cursor = self._conn.execute(query + " ORDER BY month, account_id, category", params)
+            columns = [c[0] for c in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    def statements(self, customer_id):
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT account_id, statement_id, first_date, last_date, transactions, new_transactions "
+                "FROM statements WHERE customer_id = ? ORDER BY account_id, first_date", (customer_id,)
+            )
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def summary(self, customer_id, start_month=None, end_month=None, accounts=None):
+        """Income, expenses, balances and category totals across the customer's accounts and months.
+
+        Returns None when the customer has no transactions in the range.
+        """
+        rollups = self.rollups(customer_id, start_month, end_month, accounts)
+        if rollups.empty:
+            return None
+
+        per_account = rollups.groupby(['month', 'account_id']).agg(
+            deposits=('deposits', 'sum'), withdrawals=('withdrawals', 'sum'), balance_sum=('balance_sum', 'sum'),
+            balance_min=('balance_min', 'min'), balance_max=('balance_max', 'max'), rows=('rows', 'sum')
+        )
+        per_account['average_balance'] = per_account['balance_sum'] / per_account['rows']
+
+        monthly = []
+        for month, accounts_month in per_account.groupby(level='month'):
+            income = accounts_month['deposits'].sum()
+            expenses = accounts_month['withdrawals'].sum()
+            monthly.append({
+                "month": month,
+                "income": round(income, 2),
+                "expenses": round(expenses, 2),
+                "savings": round(income - expenses, 2),
+                # Balances of different accounts add up; their averages are per account first
+                "average_balance": round(accounts_month['average_balance'].sum(), 2),
+                "balances": {
+                    account: {"average": round(row['average_balance'], 2),
+                              "min": round(row['balance_min'], 2), "max": round(row['balance_max'], 2)}
+                    for (_, account), row in accounts_month.iterrows()
+                }
+            })
+
+        spent = rollups[(rollups['expense_rows'] > 0) & (rollups['category'] != '')]
+        categories = spent.groupby('category')['expenses'].sum().sort_values(ascending=False)
+
+        income = rollups['deposits'].sum()
+        expenditure = rollups['withdrawals'].sum()
+        savings = income - expenditure
+        return {
+            "customer_id": customer_id,
+            "accounts": sorted(rollups['account_id'].unique().tolist()),
+            "from": monthly[0]["month"],
+            "to": monthly[-1]["month"],
+            "months": len(monthly),
+            "income": round(income, 2),
+            "expenditure": round(expenditure, 2),
+            "savings": round(savings, 2),
+            "savings_to_income_ratio": round((savings / income) * 100 if income != 0 else 0, 2),
+            "average_monthly_income": round(income / len(monthly), 2),
+            "average_monthly_expenses": round(expenditure / len(monthly), 2),
+            "average_monthly_balance": round(sum(m["average_balance"] for m in monthly) / len(monthly), 2),
+            "monthly": monthly,
+            "expenses_by_category": {category: round(total, 2) for category, total in categories.items()}
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "cache/results.sqlite3")
+
+# Least recently used results are evicted beyond this many bytes
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+def statement_key(pdf_sha256, password, pipeline_version, rules_version, model_version="none"):
+    """Content address of a statement: the PDF's SHA-256, password and the code/rules/model that processed it."""
+    digest = hashlib.sha256()
+    for part in (pipeline_version, rules_version, model_version, password or "", pdf_sha256):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ResultCache:
+    """Size-bounded LRU cache of pipeline results (summary text and graph URLs), in SQLite."""
+
+    def __init__(self, path=RESULT_CACHE_PATH, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, rules_version TEXT NOT NULL, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+
+    def get(self, key):
+        """Returns the cached result dict for key, or None."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+                self.hits += 1
+        metrics.cache_lookup("result", row is not None)
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, rules_version, result):
+        """Stores a JSON-serializable result and evicts the least recently used beyond max_bytes."""
+        value = json.dumps(result)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, rules_version, value, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, rules_version, value, len(value), time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+
+    def invalidate(self, keep_rules_version=None):
+        """Drops every result, or only those not made with keep_rules_version; returns the count."""
+        with self._lock, self._conn:
+            if keep_rules_version is None:
+                return self._conn.execute("DELETE FROM results").rowcount
+            return self._conn.execute(
+                "DELETE FROM results WHERE rules_version != ?", (keep_rules_version,)
+            ).rowcount
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
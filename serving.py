@@ -0,0 +1,112 @@
+"""Production serving: pre-forked gunicorn workers that start warm.
+
+    gunicorn -c gunicorn.conf.py "7-backend:app"
+
+The gunicorn master imports the heavy libraries once (preload_modules),
+so every forked worker starts with them loaded. Each worker then builds
+its own shared categorizer, LLM client, HTTP sessions and chart fonts in
+the background (start_warm_up); GET /ready answers 503 until that is done,
+and keeps doing so if image storage could not be set up.
+Connections and thread pools are never created in the master, because
+they cannot be shared across a fork.
+"""
+import importlib
+import threading
+import time
+
+import metrics
+
+# Imported in the master before forking
+PRELOAD_MODULES = [
+    "numpy", "pandas", "pyarrow.parquet", "openpyxl", "matplotlib.figure", "matplotlib.backends.backend_agg",
+    "sklearn.pipeline", "langchain_groq", "flask", "requests", "pipeline"
+]
+
+READY = threading.Event()
+
+# Step -> seconds, from this worker's warm-up
+warm_up_timings = {}
+
+# Steps the worker cannot serve without; if one fails, /ready keeps answering 503
+REQUIRED_STEPS = {"image_storage"}
+failed_steps = []
+
+def preload_modules(modules=PRELOAD_MODULES):
+    """Imports modules so they are loaded once, before workers fork; returns the import time."""
+    start = time.perf_counter()
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            print(f"⚠️ Not preloading {module}: {e}")
+    return time.perf_counter() - start
+
+def warm_chart_fonts():
+    # Font discovery and the first Agg draw are slow, so draw one throwaway chart
+    import pandas as pd
+    from aggregates import aggregate_statement
+    from chart_render import render_chart
+
+    sample = pd.DataFrame({"Date": pd.to_datetime(["2024-01-01", "2024-02-01"]), "Withdrawal Amt.": [10.0, 20.0],
+                           "Deposit Amt.": [30.0, 0.0], "Closing Balance": [20.0, 0.0], "Category": ["FOOD", "RENT"]})
+    render_chart("income_vs_expenses", aggregate_statement(sample))
+
+def warm_up():
+    """Builds this worker's shared objects, then marks it ready; returns {step: seconds}."""
+    import pipeline
+    from downloader import get_session
+    from image_storage import get_storage
+
+    steps = [
+        ("categorizer", lambda: pipeline.get_categorizer()),
+        ("llm_client", lambda: pipeline.get_categorizer().llm),
+        ("charts", warm_chart_fonts),
+        ("download_session", get_session),
+        ("image_storage", get_storage)
+    ]
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            if name in REQUIRED_STEPS:
+                failed_steps.append(name)
+                print(f"❌ Warm-up step {name} failed: {e}")
+            else:
+                # A missing optional piece only means that step stays cold
+                print(f"⚠️ Warm-up step {name} failed: {e}")
+        warm_up_timings[name] = time.perf_counter() - start
+
+    READY.set()
+    if failed_steps:
+        print(f"❌ Worker not ready, failed: {', '.join(failed_steps)}")
+    else:
+        print(f"✅ Worker ready in {sum(warm_up_timings.values()):.2f}s")
+    return dict(warm_up_timings)
+
+def start_warm_up():
+    """Warms up in a background thread, so the worker can start accepting connections."""
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def add_readiness(app):
+    """Adds GET /ready (503 until warmed up, or if a required step failed) and GET /healthz (the process is alive)."""
+    from flask import jsonify
+
+    @app.route('/ready', methods=['GET'])
+    def ready():
+        if not READY.is_set():
+            return jsonify({"status": "warming_up"}), 503
+        if failed_steps:
+            return jsonify({"status": "not_ready", "failed": failed_steps}), 503
+        from merchant_rules import current_rules
+
+        return jsonify({"status": "ready", "rules_version": current_rules().version,
+                        "warm_up": metrics.rounded(warm_up_timings)}), 200
+
+    @app.route('/healthz', methods=['GET'])
+    def healthz():
+        return jsonify({"status": "ok"}), 200
+
+    return app
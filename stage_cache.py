@@ -0,0 +1,107 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+import pandas as pd
+
+import metrics
+
+STAGE_CACHE_PATH = os.getenv("STAGE_CACHE_PATH", "cache/stages")
+
+# Least recently used artifacts are evicted beyond this many bytes
+STAGE_CACHE_MAX_BYTES = int(os.getenv("STAGE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+def fingerprint(value):
+    """Content hash of a stage input or output: bytes, text, DataFrames or dicts of them."""
+    digest = hashlib.sha256()
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr((list(value.columns), [str(t) for t in value.dtypes])).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, dict):
+        for key in value:
+            digest.update(repr(key).encode())
+            digest.update(fingerprint(value[key]).encode())
+    elif isinstance(value, bytes):
+        digest.update(value)
+    else:
+        digest.update(str(value).encode())
+    return digest.hexdigest()
+
+class StageCache:
+    """On-disk memo of stage outputs keyed by (stage, stage version, input fingerprint).
+
+    A stage is only rerun when its code/config version or its input
+    changed, so editing the categorization rules reruns categorize and
+    everything after it, but reuses the converted and cleaned statement.
+    """
+
+    def __init__(self, root=STAGE_CACHE_PATH, max_bytes=STAGE_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, stage, key):
+        return os.path.join(self.root, stage, key + ".pkl")
+
+    def run(self, stage, version, input_fingerprint, compute, cacheable=None):
+        """Returns (output, output fingerprint, reused) for a stage, computing it only on a miss.
+
+        A computed output is stored unless cacheable() says otherwise afterwards.
+        """
+        key = hashlib.sha256(f"{stage}\0{version}\0{input_fingerprint}".encode()).hexdigest()
+        path = self._path(stage, key)
+
+        try:
+            with open(path, "rb") as f:
+                output_fingerprint, output = pickle.load(f)
+            os.utime(path)
+            metrics.cache_lookup("stage", True)
+            return output, output_fingerprint, True
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Ignoring unreadable {stage} cache entry: {e}")
+
+        metrics.cache_lookup("stage", False)
+        output = compute()
+        output_fingerprint = fingerprint(output)
+        if cacheable is None or cacheable():
+            self._store(path, (output_fingerprint, output))
+        return output, output_fingerprint, False
+
+    def _store(self, path, entry):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for folder, _, files in os.walk(self.root):
+                for name in files:
+                    if name.endswith(".pkl"):
+                        path = os.path.join(folder, name)
+                        stat = os.stat(path)
+                        entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+class NoStageCache:
+    """Stand-in that always computes, for runs that should not touch the cache."""
+
+    def run(self, stage, version, input_fingerprint, compute, cacheable=None):
+        return compute(), None, False
@@ -0,0 +1,82 @@
+"""Typed columnar storage for the statement tables passed between stages.
+
+Cleaned and categorized statements are kept as Parquet with amounts as
+float64, dates as datetime64 and Category as a categorical, so later
+stages load only the columns they use and never re-parse text. CSV stays
+available through export_csv.
+"""
+import os
+
+import pandas as pd
+
+AMOUNT_COLUMNS = ["Withdrawal Amt.", "Deposit Amt.", "Closing Balance"]
+DATE_COLUMN = "Date"
+CATEGORY_COLUMN = "Category"
+
+def parse_amounts(col):
+    """Comma-formatted amount text to float64; numeric columns pass through."""
+    if pd.api.types.is_numeric_dtype(col):
+        return col.astype("float64")
+    return pd.to_numeric(col.astype(str).str.replace(',', ''), errors='coerce')
+
+def typed_statement(df):
+    """Returns the statement with numeric amounts, datetime dates, a categorical Category and text elsewhere."""
+    df = df.copy()
+    for column in AMOUNT_COLUMNS:
+        if column in df.columns:
+            df[column] = parse_amounts(df[column])
+    if DATE_COLUMN in df.columns and not pd.api.types.is_datetime64_any_dtype(df[DATE_COLUMN]):
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], errors='coerce')
+    if CATEGORY_COLUMN in df.columns and not isinstance(df[CATEGORY_COLUMN].dtype, pd.CategoricalDtype):
+        df[CATEGORY_COLUMN] = df[CATEGORY_COLUMN].astype("category")
+
+    # Every other column is text: Parquet cannot store mixed object columns such as
+    # reference numbers read as ints next to '0000XYZ', or Value Dt dates next to strings
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].astype("string")
+    return df
+
+def write_statement(df, path):
+    """Writes a statement as typed Parquet."""
+    typed_statement(df).to_parquet(path, index=False)
+
+def read_statement(path, columns=None):
+    """Loads a statement, or only the given columns of it.
+
+    Parquet comes back typed as written; a CSV (e.g. from an older run)
+    is parsed into the same types.
+    """
+    if os.path.splitext(path)[1].lower() == ".csv":
+        return typed_statement(pd.read_csv(path, usecols=columns))
+    return pd.read_parquet(path, columns=columns)
+
+def export_csv(df, path):
+    """Writes a statement as CSV, for spreadsheets and other tools."""
+    df.to_csv(path, index=False)
+
+def csv_to_parquet(csv_path, parquet_path, chunk_rows=100_000):
+    """Converts a large CSV statement to typed Parquet one chunk at a time."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    schema = None
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, dtype=str):
+            chunk = typed_statement(chunk)
+            if writer is None:
+                # Fixed types, so an all-empty column in the first chunk does not decide the schema
+                schema = pa.schema([
+                    (c, pa.float64() if c in AMOUNT_COLUMNS
+                     else pa.timestamp("ns") if c == DATE_COLUMN
+                     else pa.dictionary(pa.int32(), pa.string()) if c == CATEGORY_COLUMN
+                     else pa.string())
+                    for c in chunk.columns
+                ])
+                writer = pq.ParquetWriter(parquet_path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+    return writer is not None
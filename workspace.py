@@ -0,0 +1,74 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+
+JOBS_FOLDER = "jobs/"
+
+# Workspaces older than this (crashed jobs, PIPELINE_PERSIST=1 output) are deleted, in seconds
+WORKSPACE_MAX_AGE = int(os.getenv("WORKSPACE_MAX_AGE", str(24 * 3600)))
+
+_next_sweep = {}
+_sweep_lock = threading.Lock()
+
+class JobWorkspace:
+    """Per-job scratch folder, so concurrent statements never share file names."""
+
+    def __init__(self, job_id=None, root=JOBS_FOLDER, keep=False):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.path = os.path.join(root, self.job_id)
+        self.upload_folder = os.path.join(self.path, "uploads")
+        self.output_folder = os.path.join(self.path, "processed_files")
+        self.pdf_path = os.path.join(self.upload_folder, "statement.pdf")
+        self.keep = keep
+
+    def create(self):
+        """Creates the workspace folders and returns the workspace."""
+        sweep_stale_workspaces(os.path.dirname(self.path))
+        os.makedirs(self.upload_folder, exist_ok=True)
+        os.makedirs(self.output_folder, exist_ok=True)
+        return self
+
+    def output_path(self, filename):
+        """Returns the path of an output file inside this workspace."""
+        return os.path.join(self.output_folder, filename)
+
+    def cleanup(self):
+        """Deletes the workspace and everything in it."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self.create()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.keep:
+            self.cleanup()
+        return False
+
+def cleanup_stale_workspaces(root=JOBS_FOLDER, max_age_seconds=WORKSPACE_MAX_AGE):
+    """Deletes workspaces left behind by crashed workers; returns how many were removed."""
+    if not os.path.isdir(root):
+        return 0
+
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
+
+def sweep_stale_workspaces(root=JOBS_FOLDER, max_age_seconds=WORKSPACE_MAX_AGE):
+    """cleanup_stale_workspaces, at most once an hour per root; returns how many were removed."""
+    root = os.path.normpath(root)
+    with _sweep_lock:
+        now = time.monotonic()
+        if now < _next_sweep.get(root, 0):
+            return 0
+        _next_sweep[root] = now + 3600
+    removed = cleanup_stale_workspaces(root, max_age_seconds)
+    if removed:
+        print(f"✅ Removed {removed} stale workspace(s) from {root}")
+    return removed